@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Performance benchmarks for lcgtools.
+
+Benchmarks are run as modules from the repository root, e.g.
+``python -m benchmarks.bleed``. They are not part of the installed package.
+The full suite is run with ``python -m benchmarks.suite`` (or ``make
+bench``), see :mod:`benchmarks.suite`.
+
+"""
+
+import random
+import time
+
+from lcgtools.graphics import LcgImage
+from PySide6 import QtCore, QtGui
+
+
+def synthetic_card(width_mm=63.5, height_mm=88, dpi=600, alpha=False,
+                   seed=0):
+    """Returns a synthetic card image with gradients and shapes.
+
+    :param width_mm: card width in mm
+    :param      dpi: image resolution
+    :param    alpha: if True the image has an alpha channel
+    :param     seed: seed for randomized image content
+    :return:         card image with physical size set from *dpi*
+    :rtype:          :class:`lcgtools.graphics.LcgImage`
+
+    """
+    rand = random.Random(seed)
+    w_px = int(width_mm/25.4*dpi)
+    h_px = int(height_mm/25.4*dpi)
+    if alpha:
+        fmt = QtGui.QImage.Format_ARGB32_Premultiplied
+    else:
+        fmt = QtGui.QImage.Format_RGB32
+    img = LcgImage(w_px, h_px, fmt)
+    img.fill(QtGui.QColor(0, 0, 0, 0))
+    color = lambda a: QtGui.QColor(rand.randrange(256), rand.randrange(256),
+                                   rand.randrange(256), a)
+    p = QtGui.QPainter(img)
+    try:
+        p.setRenderHint(QtGui.QPainter.Antialiasing)
+        grad = QtGui.QLinearGradient(0, 0, w_px, h_px)
+        grad.setColorAt(0, color(255))
+        grad.setColorAt(1, color(160 if alpha else 255))
+        p.fillRect(QtCore.QRect(0, 0, w_px, h_px), QtGui.QBrush(grad))
+        p.setPen(QtCore.Qt.NoPen)
+        for i in range(8):
+            p.setBrush(color(rand.randrange(64, 256)))
+            d = rand.randrange(w_px//20, w_px//3)
+            x, y = rand.randrange(w_px), rand.randrange(h_px)
+            p.drawEllipse(QtCore.QRect(x - d//2, y - d//2, d, d))
+    finally:
+        del p
+    img.setWidthMm(width_mm)
+    img.setHeightMm(height_mm)
+    return img
+
+
+def timeit(func, repeat=5):
+    """Returns the best wall clock time in seconds of calling *func*."""
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Benchmarks :meth:`lcgtools.graphics.LcgImage.addBleed` methods.
+
+Usage: ``python -m benchmarks.bleed [--dpi DPI] [--bleed MM]``
+
+"""
+
+from argparse import ArgumentParser
+
+from benchmarks import synthetic_card, timeit
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark addBleed methods.')
+    parser.add_argument('--dpi', type=int, default=600, help='card dpi [600]')
+    parser.add_argument('--bleed', type=float, default=3,
+                        help='bleed to add in mm [3]')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timing repetitions [5]')
+    args = parser.parse_args()
+
+    methods = ['simple', 'numpy', 'mirror', 'reflect']
+    print(f'addBleed({args.bleed} mm) on 63.5x88 mm cards at {args.dpi} dpi')
+    for alpha in (False, True):
+        img = synthetic_card(dpi=args.dpi, alpha=alpha)
+        reference = img.addBleed(args.bleed, method='simple')
+        label = 'alpha' if alpha else 'opaque'
+        for method in methods:
+            try:
+                result = img.addBleed(args.bleed, method=method)
+            except Exception as e:
+                print(f'  {label:6} {method:8} unavailable: {e}')
+                continue
+            t = timeit(lambda: img.addBleed(args.bleed, method=method),
+                       repeat=args.repeat)
+            if method in ('simple', 'numpy'):
+                same = 'identical' if result == reference else 'DIFFERENT'
+            else:
+                same = ''
+            line = (f'  {label:6} {method:8} {img.width()}x{img.height()} '
+                    f'px {t*1000:8.2f} ms  {same}')
+            print(line.rstrip())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""Synthetic card image corpora for benchmarks.
+
+Usage: ``python -m benchmarks.corpus DIR [--cards N] [--dpi DPI ...]``
+
+A corpus is a directory of card images with a mix of file formats (PNG and
+JPEG), with and without an alpha channel, and with portrait and landscape
+aspect. Images embed their dpi resolution, so that they have the physical
+size of a card.
+
+"""
+
+from argparse import ArgumentParser
+import os
+import os.path
+
+from benchmarks import synthetic_card
+
+# Image variants (format, alpha, landscape) cycled through in a corpus
+VARIANTS = (('png', False, False),
+            ('jpg', False, False),
+            ('png', True, False),
+            ('jpg', False, True),
+            ('png', False, True),
+            ('png', True, True))
+
+
+def make_corpus(path, cards=12, dpi=300, width_mm=63.5, height_mm=88):
+    """Generates a synthetic card corpus.
+
+    :param      path: directory to write the corpus to (created if needed)
+    :param     cards: number of card images to generate
+    :param       dpi: resolution of generated images
+    :param  width_mm: card width in mm (portrait aspect)
+    :param height_mm: card height in mm (portrait aspect)
+    :return:          list of generated file names
+    :rtype:           list(str)
+
+    Images are not regenerated if a file with the same name already exists.
+
+    """
+    os.makedirs(path, exist_ok=True)
+    filenames = []
+    for i in range(cards):
+        fmt, alpha, landscape = VARIANTS[i % len(VARIANTS)]
+        aspect = 'l' if landscape else 'p'
+        _alpha = 'a' if alpha else 'o'
+        name = f'card{i:04d}_{dpi}dpi_{aspect}{_alpha}.{fmt}'
+        filename = os.path.join(path, name)
+        if not os.path.exists(filename):
+            if landscape:
+                img = synthetic_card(height_mm, width_mm, dpi, alpha=alpha,
+                                     seed=i)
+            else:
+                img = synthetic_card(width_mm, height_mm, dpi, alpha=alpha,
+                                     seed=i)
+            if not img.save(filename, quality=90):
+                raise RuntimeError(f'Could not save "{filename}"')
+        filenames.append(filename)
+    return filenames
+
+
+def make_back(path, dpi=300, width_mm=63.5, height_mm=88):
+    """Generates a synthetic back side image, returning its file name."""
+    os.makedirs(path, exist_ok=True)
+    filename = os.path.join(path, f'back_{dpi}dpi.png')
+    if not os.path.exists(filename):
+        img = synthetic_card(width_mm, height_mm, dpi, seed=-1)
+        if not img.save(filename):
+            raise RuntimeError(f'Could not save "{filename}"')
+    return filename
+
+
+def main():
+    parser = ArgumentParser(description='Generate synthetic card corpus.')
+    parser.add_argument('path', metavar='DIR', help='output directory')
+    parser.add_argument('--cards', type=int, default=12,
+                        help='number of cards per resolution [12]')
+    parser.add_argument('--dpi', type=int, nargs='+', default=[300],
+                        help='image resolution(s) [300]')
+    args = parser.parse_args()
+    for dpi in args.dpi:
+        files = make_corpus(args.path, cards=args.cards, dpi=dpi)
+        make_back(args.path, dpi=dpi)
+        print(f'{len(files)} cards at {dpi} dpi in {args.path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Benchmarks :meth:`lcgtools.graphics.LcgImage.resampled` qualities.
+
+Usage: ``python -m benchmarks.resample [--dpi DPI] [--target_dpi DPI]``
+
+Reports time per card for Qt's fast and smooth transformations and for the
+numpy Lanczos resampling of :func:`lcgtools.pixels.resample`. Aliasing is
+measured by downscaling a card with one pixel wide black stripes every third
+pixel, which ideally becomes uniformly gray; the reported value is the
+standard deviation of the result (lower is better).
+
+"""
+
+from argparse import ArgumentParser
+
+from PySide6 import QtCore, QtGui
+
+from benchmarks import synthetic_card, timeit
+from lcgtools.graphics import LcgImage
+
+try:
+    import numpy
+    from lcgtools import pixels
+except ImportError:
+    numpy = None
+
+
+def stripes(width, height):
+    """Returns white image with 1 pixel black stripes every 3 pixels."""
+    img = LcgImage(width, height, QtGui.QImage.Format_RGB32)
+    img.fill(QtGui.QColor('white'))
+    p = QtGui.QPainter(img)
+    try:
+        p.setPen(QtCore.Qt.NoPen)
+        p.setBrush(QtGui.QColor('black'))
+        # A single path avoids one painter call per stripe
+        path = QtGui.QPainterPath()
+        for x in range(0, width, 3):
+            path.addRect(x, 0, 1, height)
+        p.drawPath(path)
+    finally:
+        del p
+    return img
+
+
+def aliasing(img):
+    """Returns the standard deviation of the green channel of an image."""
+    arr = pixels.image_array(img).view(numpy.uint8)
+    return float(arr.reshape(img.height(), img.width(), 4)[..., 1].std())
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark image resampling.')
+    parser.add_argument('--dpi', type=int, default=1200,
+                        help='source card dpi [1200]')
+    parser.add_argument('--target_dpi', type=int, default=300,
+                        help='target dpi [300]')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timing repetitions [3]')
+    args = parser.parse_args()
+
+    w = int(63.5*args.target_dpi/25.4)
+    h = int(88*args.target_dpi/25.4)
+    size = QtCore.QSize(w, h)
+    methods = [('qt fast', lambda i: i.scaled(size)),
+               ('qt smooth', lambda i: i.scaled(
+                   size, QtCore.Qt.IgnoreAspectRatio,
+                   QtCore.Qt.SmoothTransformation))]
+    if numpy:
+        methods.append(('lanczos', lambda i: pixels.resample(i, w, h)))
+    tiers = {'qt fast': 'fast', 'qt smooth': 'balanced', 'lanczos': 'best'}
+
+    card = synthetic_card(dpi=args.dpi)
+    lines = stripes(card.width(), card.height())
+    print(f'63.5x88 mm card {card.width()}x{card.height()} px '
+          f'({args.dpi} dpi) to {w}x{h} px ({args.target_dpi} dpi)')
+    for name, func in methods:
+        t = timeit(lambda: func(card), repeat=args.repeat)
+        line = f'  {name:10} {t*1000:8.1f} ms/card'
+        if numpy:
+            line += f'  aliasing {aliasing(func(lines)):6.1f}'
+        if name in tiers:
+            line += f'  (--resample {tiers[name]})'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Benchmarks right-angle rotation of :class:`lcgtools.graphics.LcgImage`.
+
+Usage: ``python -m benchmarks.rotate [--dpi DPI]``
+
+Compares :meth:`lcgtools.graphics.LcgImage.rotateRightAngle` with rotating by
+a general :meth:`PySide6.QtGui.QTransform.rotate` transform (the previous
+implementation) and, if numpy is installed, with copying a
+:func:`numpy.rot90` view of the pixels into a new image. Results are checked
+to be identical pixel by pixel.
+
+"""
+
+from argparse import ArgumentParser
+
+from PySide6 import QtGui
+
+from benchmarks import synthetic_card, timeit
+
+try:
+    import numpy
+    from lcgtools.pixels import image_array
+except ImportError:
+    numpy = None
+
+
+def _qtransform_rotate(img, rotation):
+    return img.transformed(QtGui.QTransform().rotate(rotation))
+
+
+def _numpy_rotate(img, rotation):
+    src = image_array(img)
+    h, w = src.shape
+    if rotation == 180:
+        result = QtGui.QImage(w, h, img.format())
+    else:
+        result = QtGui.QImage(h, w, img.format())
+    image_array(result, writable=True)[:] = numpy.rot90(src, -rotation//90)
+    return result
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark right-angle rotation.')
+    parser.add_argument('--dpi', type=int, default=600, help='card dpi [600]')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timing repetitions [5]')
+    args = parser.parse_args()
+
+    methods = [('rotateRightAngle', lambda i, r: i.rotateRightAngle(r)),
+               ('QTransform', _qtransform_rotate)]
+    if numpy:
+        methods.append(('numpy.rot90', _numpy_rotate))
+    print(f'Rotation of 63.5x88 mm cards at {args.dpi} dpi')
+    for alpha in (False, True):
+        img = synthetic_card(dpi=args.dpi, alpha=alpha)
+        label = 'alpha' if alpha else 'opaque'
+        for rotation in (90, 180, 270):
+            reference = img.rotateRightAngle(rotation)
+            for name, func in methods:
+                t = timeit(lambda: func(img, rotation), repeat=args.repeat)
+                result = func(img, rotation)
+                same = 'identical' if result == reference else 'DIFFERENT'
+                print(f'  {label:6} {rotation:3} {name:16} {t*1000:8.2f} ms'
+                      f'  {same}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""Benchmarks startup time of lcgtools command line scripts.
+
+Usage: ``python -m benchmarks.startup [--repeat N]``
+
+Measures the wall clock time of script invocations which exit without
+processing images (e.g. ``--version``), and reports whether PySide6 was
+imported by importing the script module.
+
+"""
+
+from argparse import ArgumentParser
+import subprocess
+import sys
+import time
+
+# Script invocations to time (module, arguments)
+COMMANDS = (('lcgtools.scripts.pdf', ['--version']),
+            ('lcgtools.scripts.pdf', ['--help']),
+            ('lcgtools.scripts.cardlist', ['--version']),
+            ('lcgtools.scripts.image', ['--version']),
+            ('lcgtools.scripts.cache', ['--version']))
+
+
+def startup_time(module, args, repeat=5):
+    """Returns best wall clock time in seconds of running a script module.
+
+    If *module* is None, the time of starting the interpreter is returned.
+
+    """
+    if module is None:
+        cmd = [sys.executable, '-c', 'pass']
+    else:
+        cmd = [sys.executable, '-m', module, *args]
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def imports_qt(module):
+    """Returns True if importing a module imports PySide6."""
+    code = (f'import sys, {module}; '
+            f'sys.exit(1 if "PySide6" in sys.modules else 0)')
+    return subprocess.run([sys.executable, '-c', code]).returncode == 1
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark script startup time.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timing repetitions [5]')
+    args = parser.parse_args()
+
+    base = startup_time(None, [], repeat=args.repeat)
+    print(f'{"python interpreter":40} {base*1000:8.1f} ms')
+    for module, m_args in COMMANDS:
+        t = startup_time(module, m_args, repeat=args.repeat)
+        name = f'{module.split(".")[-1]} {" ".join(m_args)}'
+        print(f'{name:40} {t*1000:8.1f} ms')
+    for module in sorted(set(m for m, a in COMMANDS)):
+        qt = 'imports' if imports_qt(module) else 'does not import'
+        print(f'{module} {qt} PySide6')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""Benchmark suite for lcgtools.
+
+Usage: ``python -m benchmarks.suite [-o results.json] [--compare old.json]``
+
+Runs benchmarks of image operations, card loading, PDF card drawing and
+end-to-end ``lcg_pdf`` runs on synthetic card corpora (see
+:mod:`benchmarks.corpus`). Each benchmark runs in a separate process, so that
+its peak memory use (RSS) can be measured. Results are written as JSON, and
+may be compared with results from an earlier run (e.g. of a previous
+release) with ``--compare``.
+
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+import inspect
+import json
+import multiprocessing
+import os
+import os.path
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CARD_WIDTH, CARD_HEIGHT = 63.5, 88
+
+
+class NotSupported(Exception):
+    """Benchmark uses a feature which the benchmarked lcgtools lacks."""
+
+
+def peak_rss_mb(children=False):
+    """Returns peak RSS of the process (or its children) in MB (or None)."""
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    max_rss = resource.getrusage(who).ru_maxrss
+    if sys.platform == 'darwin':
+        return max_rss/1024**2
+    return max_rss/1024
+
+
+def _app():
+    """Returns a (headless) Qt application for the benchmark process.
+
+    The application is kept alive by PySide6 once created, so callers need
+    not hold a reference to it.
+
+    """
+    from PySide6.QtGui import QGuiApplication
+    app = QGuiApplication.instance()
+    if app is None:
+        app = QGuiApplication(['lcg_bench', '-platform', 'offscreen'])
+    return app
+
+
+def bench_image_op(op, dpi, alpha, repeat):
+    """Benchmarks an :class:`lcgtools.graphics.LcgImage` operation."""
+    from benchmarks import synthetic_card, timeit
+    img = synthetic_card(CARD_WIDTH, CARD_HEIGHT, dpi, alpha=alpha)
+    if op.startswith('addBleed:'):
+        method = op.split(':')[1]
+        func = lambda: img.addBleed(3, method=method)
+    elif op == 'cropBleed':
+        func = lambda: img.cropBleed(3)
+    elif op == 'cropBleed:view':
+        func = lambda: img._cropped(3, view=True)
+    elif op.startswith('resampled:'):
+        quality = op.split(':')[1]
+        w, h = img.width()//2, img.height()//2
+        func = lambda: img.resampled(w, h, quality)
+    else:
+        func = getattr(img, op)
+    seconds = timeit(func, repeat=repeat)
+    return dict(seconds=seconds, cards=1)
+
+
+def _generator(outfile, dpi, twosided):
+    from lcgtools.graphics import LcgCardPdfGenerator
+    return LcgCardPdfGenerator(outfile=outfile, pagesize='a4', dpi=dpi,
+                               c_width=CARD_WIDTH, c_height=CARD_HEIGHT,
+                               bleed=3, folded=not twosided)
+
+
+def _accepts(func, name):
+    """Returns True if *func* has a parameter *name*.
+
+    Used for benchmarking older lcgtools releases, which lack some arguments
+    of current methods.
+
+    """
+    return name in inspect.signature(func).parameters
+
+
+def bench_load_card(corpus, dpi):
+    """Benchmarks :meth:`LcgCardPdfGenerator.loadCard` on a corpus."""
+    from lcgtools.graphics import LcgAspectRotation
+    _app()
+    trans = LcgAspectRotation(portrait=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        gen = _generator(os.path.join(tmp, 'out.pdf'), dpi, False)
+        start = time.perf_counter()
+        for filename in corpus:
+            gen.loadCard(filename, trans=trans)
+        seconds = time.perf_counter() - start
+        gen.abort()
+    return dict(seconds=seconds, cards=len(corpus))
+
+
+def bench_draw_card(corpus, back, dpi, twosided):
+    """Benchmarks :meth:`LcgCardPdfGenerator.drawCard` and PDF writing."""
+    from lcgtools.graphics import LcgAspectRotation
+    _app()
+    trans = LcgAspectRotation(portrait=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        outfile = os.path.join(tmp, 'out.pdf')
+        gen = _generator(outfile, dpi, twosided)
+        back_img = gen.loadCard(back)
+        # Releases without these arguments rotate card images when loading
+        # them, and rotate folded backs when drawing them
+        load_kw, draw_kw = dict(trans=trans), dict()
+        if _accepts(gen.loadCard, 'defer_rotation'):
+            load_kw['defer_rotation'] = True
+        if _accepts(gen.drawCard, 'back_rotation'):
+            draw_kw['back_rotation'] = 0 if twosided else 180
+        fronts = [gen.loadCard(f, **load_kw) for f in corpus]
+        start = time.perf_counter()
+        for front in fronts:
+            gen.drawCard(front, back_img, **draw_kw)
+        gen.finish()
+        seconds = time.perf_counter() - start
+        output_bytes = os.path.getsize(outfile)
+    return dict(seconds=seconds, cards=len(corpus), output_bytes=output_bytes)
+
+
+def _lcg_pdf_options():
+    """Returns set of command line options of the lcg_pdf script."""
+    cmd = [sys.executable, '-m', 'lcgtools.scripts.pdf', '--help']
+    proc = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return set(re.findall(r'--\w+', proc.stdout))
+
+
+def bench_lcg_pdf(corpus_dir, back, dpi, cards, extra_args):
+    """Benchmarks an end-to-end run of the lcg_pdf script.
+
+    Raises :exc:`NotSupported` if lcg_pdf lacks an option of *extra_args*.
+
+    """
+    options = _lcg_pdf_options()
+    for arg in extra_args:
+        if arg.startswith('--') and arg not in options:
+            raise NotSupported(f'lcg_pdf has no option {arg}')
+    with tempfile.TemporaryDirectory() as tmp:
+        outfile = os.path.join(tmp, 'out.pdf')
+        cmd = [sys.executable, '-m', 'lcgtools.scripts.pdf', '--dpi',
+               str(dpi), '--width', str(CARD_WIDTH), '--height',
+               str(CARD_HEIGHT), '-b', back, '-o', outfile, *extra_args,
+               corpus_dir]
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        seconds = time.perf_counter() - start
+        if not os.path.exists(outfile):
+            raise RuntimeError('lcg_pdf did not generate output')
+        output_bytes = os.path.getsize(outfile)
+    return dict(seconds=seconds, cards=cards, output_bytes=output_bytes,
+                child_peak_rss_mb=peak_rss_mb(children=True))
+
+
+def _run_case(func, args):
+    """Runs a benchmark in the current (worker) process."""
+    result = func(*args)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_case(name, func, *args):
+    """Runs a benchmark in a new process and returns its result record."""
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+        result = executor.submit(_run_case, func, args).result()
+    result['name'] = name
+    if result.get('seconds'):
+        result['cards_per_second'] = result['cards']/result['seconds']
+    if result.get('child_peak_rss_mb') is not None:
+        result['peak_rss_mb'] = result.pop('child_peak_rss_mb')
+    return result
+
+
+def environment():
+    """Returns information about the benchmark environment."""
+    import lcgtools
+    import PySide6
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return dict(lcgtools=lcgtools.__version__, pyside6=PySide6.__version__,
+                numpy=numpy_version, python=platform.python_version(),
+                platform=platform.platform(), cpus=os.cpu_count(),
+                time=time.strftime('%Y-%m-%dT%H:%M:%S%z'))
+
+
+def cases(corpus_dir, dpis, n_cards, repeat):
+    """Generates (name, func, args) for benchmarks to run."""
+    from benchmarks.corpus import make_corpus, make_back
+    for dpi in dpis:
+        for alpha in (False, True):
+            _a = 'alpha' if alpha else 'opaque'
+            for op in ('addBleed:simple', 'addBleed:numpy', 'addBleed:mirror',
+                       'cropBleed', 'cropBleed:view', 'rotateClockwise',
+                       'rotateAntiClockwise', 'rotateHalfCircle',
+                       'resampled:fast', 'resampled:balanced',
+                       'resampled:best'):
+                yield (f'{op}[{dpi}dpi,{_a}]', bench_image_op,
+                       (op, dpi, alpha, repeat))
+
+        sub_dir = os.path.join(corpus_dir, f'{dpi}dpi')
+        corpus = make_corpus(sub_dir, cards=n_cards, dpi=dpi)
+        back = make_back(corpus_dir, dpi=dpi)
+        yield (f'loadCard[{dpi}dpi]', bench_load_card, (corpus, dpi))
+        for twosided in (False, True):
+            _mode = 'twosided' if twosided else 'folded'
+            yield (f'drawCard[{dpi}dpi,{_mode}]', bench_draw_card,
+                   (corpus, back, dpi, twosided))
+        for name, extra in (('folded', []), ('twosided', ['--twosided']),
+                            ('jobs', ['--jobs', '0']),
+                            ('native', ['--native_resolution']),
+                            ('auto_encoding', ['--image_encoding', 'auto'])):
+            yield (f'lcg_pdf[{dpi}dpi,{name}]', bench_lcg_pdf,
+                   (sub_dir, back, dpi, len(corpus), ['--overwrite', *extra]))
+
+
+def compare(results, old_results):
+    """Prints comparison of results with results from an earlier run."""
+    old = {r['name']: r for r in old_results['results']}
+    print(f'\nComparison with {old_results["environment"]["lcgtools"]} '
+          f'({old_results["environment"]["time"]}):')
+    for r in results:
+        o = old.get(r['name'])
+        if o is None or 'seconds' not in r or 'seconds' not in o:
+            # New benchmark, or not run successfully by both versions
+            print(f'  {r["name"]:42} not comparable')
+            continue
+        line = f'  {r["name"]:42} speed {o["seconds"]/r["seconds"]:6.2f}x'
+        if r.get('peak_rss_mb') and o.get('peak_rss_mb'):
+            line += f'  rss {r["peak_rss_mb"]/o["peak_rss_mb"]:6.2f}x'
+        if r.get('output_bytes') and o.get('output_bytes'):
+            line += f'  size {r["output_bytes"]/o["output_bytes"]:6.2f}x'
+        print(line)
+
+
+def main():
+    parser = ArgumentParser(description='Run lcgtools benchmark suite.')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='write JSON results to file')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare with JSON results of an earlier run')
+    parser.add_argument('--corpus', metavar='DIR',
+                        help='corpus directory (reused between runs)')
+    parser.add_argument('--dpi', type=int, nargs='+', default=[300, 600],
+                        help='card resolution(s) [300 600]')
+    parser.add_argument('--cards', type=int, default=12,
+                        help='number of cards in corpus [12]')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timing repetitions for image operations [5]')
+    parser.add_argument('-k', '--filter', metavar='TEXT',
+                        help='only run benchmarks with TEXT in their name')
+    args = parser.parse_args()
+
+    tmp = None
+    if args.corpus is None:
+        tmp = tempfile.TemporaryDirectory()
+        args.corpus = tmp.name
+    results = []
+    try:
+        for name, func, f_args in cases(args.corpus, args.dpi, args.cards,
+                                        args.repeat):
+            if args.filter and args.filter not in name:
+                continue
+            try:
+                r = run_case(name, func, *f_args)
+            except NotSupported as e:
+                r = dict(name=name, not_supported=str(e))
+                print(f'{name:44} not supported: {e}')
+            except Exception as e:
+                r = dict(name=name, error=str(e))
+                print(f'{name:44} error: {e}')
+            else:
+                line = (f'{name:44} {r["seconds"]*1000:10.1f} ms '
+                        f'{r["cards_per_second"]:9.1f} cards/s')
+                if r['peak_rss_mb'] is not None:
+                    line += f' {r["peak_rss_mb"]:7.0f} MB'
+                if 'output_bytes' in r:
+                    line += f' {r["output_bytes"]/1024**2:7.1f} MB pdf'
+                print(line)
+            results.append(r)
+    finally:
+        if tmp:
+            tmp.cleanup()
+
+    data = dict(environment=environment(), results=results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Stress test of concurrent :class:`lcgtools.graphics.LcgImage` operations.
+
+Usage: ``python -m benchmarks.threads [--threads N] [--operations N]``
+
+Runs bleed, crop and rotation operations from many threads at once, without
+a Qt application object, on source images shared by all threads. Each result
+is compared with a reference result computed serially, and the script exits
+with an error status if any result differs or an operation fails.
+
+Operations are run in batches, each in a new process. Some PySide6 releases
+leak a reference to None for each call of a Qt method without a return
+value, which crashes a process after some thousands of Qt calls.
+
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
+import multiprocessing
+import random
+import sys
+import time
+
+from benchmarks import synthetic_card
+
+DPI = 150
+
+
+def _operations():
+    """Returns list of (name, func) operations to test."""
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    bleed_methods = ['simple', 'mirror', 'reflect']
+    if numpy:
+        bleed_methods.append('numpy')
+    ops = []
+    for method in bleed_methods:
+        for bleed in (0.5, 3):
+            ops.append((f'addBleed({bleed}, {method})',
+                        lambda i, b=bleed, m=method: i.addBleed(b, method=m)))
+    ops.append(('cropBleed(2)', lambda i: i.cropBleed(2)))
+    ops.append(('_cropped(2, view)', lambda i: i._cropped(2, view=True)))
+    for rotation in (90, 180, 270):
+        ops.append((f'rotateRightAngle({rotation})',
+                    lambda i, r=rotation: i.rotateRightAngle(r)))
+    return ops
+
+
+def _digest(img):
+    """Returns a digest of image pixels and physical size."""
+    h = hashlib.blake2b(digest_size=16)
+    for y in range(img.height()):
+        h.update(img.constScanLine(y)[:img.width()*img.depth()//8])
+    h.update(repr((img.width(), img.height(), img.format().value,
+                   img.dotsPerMeterX(), img.dotsPerMeterY())).encode())
+    return h.hexdigest()
+
+
+def run_batch(n_threads, n_ops, seed):
+    """Runs a batch of operations in threads and checks the results.
+
+    :return: tuple (number of errors, error messages, seconds)
+
+    """
+    sources = [synthetic_card(dpi=DPI, alpha=alpha, seed=seed)
+               for alpha in (False, True)]
+    ops = _operations()
+    references = {(s, o): _digest(func(src))
+                  for s, src in enumerate(sources)
+                  for o, (name, func) in enumerate(ops)}
+    rand = random.Random(seed)
+    tasks = [(rand.randrange(len(sources)), rand.randrange(len(ops)))
+             for i in range(n_ops)]
+
+    def run(task):
+        s, o = task
+        name, func = ops[o]
+        try:
+            result = _digest(func(sources[s]))
+        except Exception as e:
+            return f'{name}: {e!r}'
+        if result != references[task]:
+            return f'{name}: result differs from serial result'
+        return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        errors = [e for e in executor.map(run, tasks) if e]
+    seconds = time.perf_counter() - start
+    return len(errors), errors[:10], seconds
+
+
+def main():
+    parser = ArgumentParser(description='Stress test LcgImage in threads.')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='number of threads [8]')
+    parser.add_argument('--operations', type=int, default=4000,
+                        help='total number of operations [4000]')
+    parser.add_argument('--batch', type=int, default=500,
+                        help='operations per process [500]')
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    n_errors, n_done, seconds = 0, 0, 0
+    seed = 0
+    while n_done < args.operations:
+        n_ops = min(args.batch, args.operations - n_done)
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+            future = executor.submit(run_batch, args.threads, n_ops, seed)
+            b_errors, messages, b_seconds = future.result()
+        for msg in messages:
+            print(f'  error: {msg}')
+        n_errors += b_errors
+        n_done += n_ops
+        seconds += b_seconds
+        seed += 1
+        print(f'{n_done}/{args.operations} operations in {args.threads} '
+              f'threads, {n_errors} errors')
+    print(f'{n_done/seconds:.0f} operations/s')
+    sys.exit(1 if n_errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -25,7 +25,10 @@ import os
 from lcgtools import LcgException
 from lcgtools.util import LcgAppResources
 
-__all__ = ['get_app_properties']
+__all__ = ['get_app_properties', 'get_image_cache']
+
+# Default max size of the image cache in MB
+IMAGE_CACHE_SIZE_MB = 2048
 
 
 def get_app_properties(game=None, create=False):
@@ -51,12 +54,18 @@ def get_app_properties(game=None, create=False):
                             ('card_width_mm', float),
                             ('card_height_mm', float),
                             ('card_bleed_mm', float),
+                            ('bleed_method', str),
+                            ('resample', str),
+                            ('native_resolution', str),
+                            ('image_encoding', str),
                             ('card_min_spacing_mm', float),
                             ('card_fold_distance_mm', float),
                             ('twosided', str),
                             ('verbose', str),
                             ('overwrite', str),
-                            ('append', str))
+                            ('append', str),
+                            ('image_cache', str),
+                            ('image_cache_size_mb', float))
         app_general_prop = (('backside_image_file', str),
                             ('backside_bleed_mm', float))
         if game:
@@ -74,3 +83,24 @@ def get_app_properties(game=None, create=False):
             raise LcgException(f'Invalid config file: {issues_str}')
         else:
             return conf
+
+
+def get_image_cache(max_size_mb=None):
+    """Gets the cache of processed card images for the app.
+
+    :param max_size_mb: max size of the cache in MB (if None use default)
+    :type  max_size_mb: float
+    :return:            image cache
+    :rtype:             :class:`lcgtools.graphics.LcgImageCache`
+
+    The cache is located in an `image_cache` subfolder of the lcg_pdf app
+    data folder.
+
+    """
+    from lcgtools.graphics import LcgImageCache
+
+    if max_size_mb is None:
+        max_size_mb = IMAGE_CACHE_SIZE_MB
+    ar = LcgAppResources(appname='lcg_pdf', author='Cloudberries',)
+    path = os.path.join(ar.user_data_dir(), 'image_cache')
+    return LcgImageCache(path, max_size=int(max_size_mb*1024**2))
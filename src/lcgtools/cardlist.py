@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Card list parsing and formatting.
+
+A card list consists of blocks of lines separated by an empty line. Each
+block has the following lines:
+
+* file name of the back side image for the cards in the block
+* bleed included in the back side image (in mm)
+* bleed included in the front side images (in mm)
+* file names of front side images, one per line
+
+"""
+
+from collections import namedtuple
+import os.path
+
+from lcgtools import LcgException
+
+__all__ = ['LcgCardListBack', 'LcgCardListBleed', 'LcgCardListFront',
+           'parse_card_list', 'format_card_list']
+
+
+class LcgCardListBack(namedtuple('LcgCardListBack', 'filename bleed line')):
+    """Card list record declaring the back side of the following cards.
+
+    :param filename: back side image file name (None if blank back side)
+    :param    bleed: bleed included in the back side image (mm)
+    :param     line: line number of the file name (None if not from a list)
+
+    """
+    __slots__ = ()
+
+
+class LcgCardListBleed(namedtuple('LcgCardListBleed', 'bleed line')):
+    """Card list record setting bleed included in following front images.
+
+    :param bleed: bleed included in front side images (mm)
+    :param  line: line number of the bleed value (None if not from a list)
+
+    """
+    __slots__ = ()
+
+
+class LcgCardListFront(namedtuple('LcgCardListFront', 'filename line')):
+    """Card list record for a card with the given front side image.
+
+    :param filename: front side image file name
+    :param     line: line number of the file name (None if not from a list)
+
+    """
+    __slots__ = ()
+
+
+def parse_card_list(lines, name=None, check_files=False):
+    """Parses a card list, generating records for its contents.
+
+    :param       lines: lines of the card list (e.g. an open file)
+    :type        lines: iterable of str
+    :param        name: name of card list, used in error messages
+    :type         name: str
+    :param check_files: if True check that listed image files exist
+    :return:            generator for the card list's records
+    :rtype:             generator of :class:`LcgCardListBack`,
+                        :class:`LcgCardListBleed` and
+                        :class:`LcgCardListFront`
+    :raises:            :exc:`lcgtools.LcgException` on invalid list
+
+    Lines are consumed one at a time as records are generated, and each line
+    is validated when it is parsed. Every block of the list generates a
+    :class:`LcgCardListBack` record followed by a :class:`LcgCardListBleed`
+    record and one :class:`LcgCardListFront` record per front side image.
+    To validate a full list before processing it, consume the generator
+    once, e.g. with ``for _ in parse_card_list(lines): pass``.
+
+    """
+    prefix = 'Card list' if name is None else f'Card list {name}'
+
+    def error(l_num, msg):
+        return LcgException(f'{prefix}, line {l_num}: {msg}')
+
+    def parse_bleed(l_num, line):
+        try:
+            bleed = float(line)
+        except ValueError:
+            raise error(l_num, f'invalid bleed value "{line}"')
+        if bleed < 0:
+            raise error(l_num, 'bleed must be non-negative')
+        return bleed
+
+    def check_file(l_num, filename):
+        if check_files and not os.path.isfile(filename):
+            raise error(l_num, f'no such image file "{filename}"')
+
+    back_name, back_line = None, None
+    state = 'back'
+    l_num = 0
+    for line in lines:
+        l_num += 1
+        line = line.rstrip('\r\n')
+        if not line:
+            if state in ('back_bleed', 'front_bleed'):
+                raise error(l_num, 'incomplete card list block')
+            state = 'back'
+        elif state == 'back':
+            # Line is file name for a card back side
+            check_file(l_num, line)
+            back_name, back_line = line, l_num
+            state = 'back_bleed'
+        elif state == 'back_bleed':
+            # Line is bleed mm for provided back side
+            bleed = parse_bleed(l_num, line)
+            yield LcgCardListBack(back_name, bleed, back_line)
+            state = 'front_bleed'
+        elif state == 'front_bleed':
+            # Line is the bleed on front images
+            yield LcgCardListBleed(parse_bleed(l_num, line), l_num)
+            state = 'front'
+        else:
+            # Line is a file name for a card front image
+            check_file(l_num, line)
+            yield LcgCardListFront(line, l_num)
+    if state in ('back_bleed', 'front_bleed'):
+        raise error(l_num, 'incomplete card list block')
+
+
+def format_card_list(records):
+    """Formats card list records as card list lines.
+
+    :param records: card list records (as generated by
+                    :func:`parse_card_list`)
+    :return:        generator for card list lines (including line endings)
+    :rtype:         generator of str
+
+    Each :class:`LcgCardListBack` record starts a new block, which must be
+    followed by a :class:`LcgCardListBleed` record.
+
+    """
+    in_block = False
+    for record in records:
+        if isinstance(record, LcgCardListBack):
+            if record.filename is None:
+                raise LcgException('Card list cannot have a blank back side')
+            if in_block:
+                yield '\n'
+            yield f'{record.filename}\n'
+            yield f'{record.bleed}\n'
+            in_block = True
+        elif isinstance(record, LcgCardListBleed):
+            yield f'{record.bleed}\n'
+        elif isinstance(record, LcgCardListFront):
+            yield f'{record.filename}\n'
+        else:
+            raise TypeError('Not a card list record')
+    if in_block:
+        yield '\n'
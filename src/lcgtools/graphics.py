@@ -20,14 +20,41 @@
 
 """Graphics related functionality."""
 
+from collections import deque, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import contextlib
+import hashlib
+import json
+import math
+import multiprocessing
+from multiprocessing import shared_memory
 import os
 import pathlib
+import struct
+import tempfile
+import threading
+import time
+import zlib
 
 from lcgtools import LcgException
 from PySide6 import QtCore, QtGui
 
-__all__ = ['LcgImage', 'LcgImageTransform', 'LcgAspectRotation',
-           'LcgCardPdfGenerator']
+__all__ = ['LcgImage', 'LcgImageInfo', 'LcgImageTransform',
+           'LcgAspectRotation', 'LcgPageLayout', 'LcgCardPdfGenerator',
+           'LcgCardLoader', 'LcgImageCache', 'LcgTracer']
+
+
+# Render hint for embedding images in a PDF with lossless compression
+_LOSSLESS = QtGui.QPainter.LosslessImageRendering
+
+
+def _pixels():
+    """Returns the :mod:`lcgtools.pixels` module (which requires numpy)."""
+    try:
+        from lcgtools import pixels
+    except ImportError:
+        raise LcgException('numpy must be installed for this operation')
+    return pixels
 
 
 class LcgImage(QtGui.QImage):
@@ -36,86 +63,381 @@ class LcgImage(QtGui.QImage):
     Overloads all :class:`PySide6.QtGui.QImage` constructors to cast the
     result as an LcgImage.
 
+    An LcgImage can have a pending rotation, see :meth:`rotation`. When
+    constructed from another LcgImage, the pending rotation is copied.
+
+    LcgImage methods only use :class:`PySide6.QtGui.QImage` pixel buffers
+    (painting with a :class:`PySide6.QtGui.QPainter` on a QImage, or with
+    numpy array operations), never a :class:`PySide6.QtGui.QPixmap` or
+    other objects tied to the GUI thread. They do not require an
+    application object, and may be called from any thread, also
+    concurrently on the same image as long as no thread modifies it (as
+    for QImage, images are implicitly shared and copied on write).
+
     """
 
+    # Matrix coefficients (m11, m12, m21, m22) for clockwise rotations
+    _RIGHT_ANGLES = {90: (0, 1, -1, 0), 180: (-1, 0, 0, -1),
+                     270: (0, -1, 1, 0)}
+
+    # Pad modes of lcgtools.pixels for each bleed method
+    _PAD_MODES = {'simple': 'edge', 'numpy': 'edge', 'mirror': 'symmetric',
+                  'reflect': 'reflect'}
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        if len(args) == 1 and isinstance(args[0], LcgImage):
+            self._rotation = args[0]._rotation
+            # The copy shares the pixels of any external buffer the image
+            # wraps, so it must also keep the buffer alive
+            for name in ('_shm', '_buffer'):
+                if hasattr(args[0], name):
+                    setattr(self, name, getattr(args[0], name))
+        else:
+            self._rotation = 0
+
+    def rotation(self):
+        """Returns the pending rotation of the image.
+
+        :return: clockwise rotation in degrees (0, 90, 180 or 270)
+        :rtype:  int
+
+        A pending rotation is applied when the image is drawn as a card with
+        :meth:`LcgCardPdfGenerator.drawCard`, by rotating the painter rather
+        than the image pixels. Images returned by :meth:`addBleed`,
+        :meth:`cropBleed`, :meth:`scaledWithBleed` and :meth:`resampled` keep
+        the pending rotation. Other methods, including :meth:`widthMm` and
+        :meth:`heightMm`, ignore it. Use :meth:`applyRotation` to get an
+        image with rotated pixels.
+
+        """
+        return self._rotation
+
+    def setRotation(self, rotation):
+        """Sets the pending rotation of the image (see :meth:`rotation`).
+
+        :param rotation: clockwise rotation in degrees (multiple of 90)
+        :type  rotation: int
+
+        """
+        if rotation % 90:
+            raise ValueError('Rotation must be a multiple of 90 degrees')
+        self._rotation = rotation % 360
+
+    def applyRotation(self):
+        """Returns image with pending rotation applied to its pixels."""
+        if not self._rotation:
+            return self
+        return self.rotateRightAngle(self._rotation)
 
     def addBleed(self, bleed, method='simple'):
         """Adds bleed for the image.
 
         :param  bleed: amount of bleed to add (in mm)
-        :param method: bleed method to apply (for future use)
+        :param method: bleed method, 'simple', 'numpy', 'mirror' or 'reflect'
         :return:       image with added bleed
         :rtype:        :class:`LcgImage`
 
-        The method can only be called if the application has initiated a
-        :class:`PySide6.QtWidgets.QApplication`.
+        Methods 'simple' and 'numpy' pad the outermost pixels of the image to
+        fill the missing space. With method 'simple' the padding is painted
+        onto a :class:`PySide6.QtGui.QImage` with a
+        :class:`PySide6.QtGui.QPainter`. Method 'numpy' gives the same result
+        by replicating edge pixels with vectorized array operations on the
+        image buffer, which requires `numpy <https://numpy.org/>`__.
+
+        Method 'mirror' fills the bleed with a mirror image of the pixels
+        inside the image edge (including the edge pixels), and 'reflect'
+        similarly reflects the pixels around the edge pixels (without
+        repeating them). These methods use vectorized array operations if
+        numpy is installed, and otherwise paint mirrored image strips. The
+        added bleed cannot be wider than the image.
+
+        All methods may also be called from worker threads.
 
         """
-        if method != 'simple':
+        if method not in ('simple', 'numpy', 'mirror', 'reflect'):
             raise ValueError(f'Method {method} not supported')
         if bleed < 0:
             raise ValueError('Bleed must be non-negative')
         if bleed == 0:
             return self
 
-        # Determine number of pixels to add vertically and horizontally
+        w_mm, h_mm = self.widthMm(), self.heightMm()
+        bleed_w_px, bleed_h_px = self._bleed_px(bleed)
+        new_img = self._padded(bleed_w_px, bleed_h_px, method)
+
+        # Return adjusted image with appropriate size (resolution is set
+        # before wrapping, as modifying a shared QImage detaches a copy)
+        new_img.setDotsPerMeterX(new_img.width()*1000/(w_mm + 2*bleed))
+        new_img.setDotsPerMeterY(new_img.height()*1000/(h_mm + 2*bleed))
+        return self._derived(new_img)
+
+    def scaledWithBleed(self, width, height, bleed, method='simple',
+                        resample='fast'):
+        """Returns image with adjusted bleed, scaled to a size in pixels.
+
+        :param    width: width of returned image (pixels)
+        :param   height: height of returned image (pixels)
+        :param    bleed: amount of bleed to add (or crop if negative) (in mm)
+        :param   method: bleed method (as for :meth:`addBleed`)
+        :param resample: resampling quality (as for :meth:`resampled`)
+        :return:         scaled image with adjusted bleed
+        :rtype:          :class:`LcgImage`
+
+        The result is the same as calling :meth:`addBleed` (or
+        :meth:`cropBleed`) and then scaling the result with
+        :meth:`resampled`, however the image is resampled only once. Excess
+        bleed is cropped with a view of the image which is scaled directly.
+        When downscaling with resample quality 'fast', added bleed is
+        sampled directly from the source image with
+        :func:`lcgtools.pixels.pad_scaled` (if numpy is installed), which
+        picks exactly the same source pixels as scaling the padded image.
+        Otherwise bleed is added before resampling, so that bleed and image
+        edge are sampled together.
+
+        """
+        if bleed < 0:
+            img = self._cropped(-bleed, view=True)
+            w_mm, h_mm = img.widthMm(), img.heightMm()
+            new_img = img.resampled(width, height, resample)
+        elif bleed == 0:
+            w_mm, h_mm = self.widthMm(), self.heightMm()
+            new_img = self.resampled(width, height, resample)
+        else:
+            if method not in ('simple', 'numpy', 'mirror', 'reflect'):
+                raise ValueError(f'Method {method} not supported')
+            w_mm, h_mm = self.widthMm() + 2*bleed, self.heightMm() + 2*bleed
+            bleed_w_px, bleed_h_px = self._bleed_px(bleed)
+
+            # Sampling pixels directly only pays off when the padded image
+            # would be larger than the result
+            padded_size = ((self.width() + 2*bleed_w_px)
+                           * (self.height() + 2*bleed_h_px))
+            pixels = None
+            if resample == 'fast' and width*height < padded_size:
+                try:
+                    pixels = _pixels()
+                except LcgException:
+                    pass
+            if pixels:
+                self._check_bleed_px(bleed_w_px, bleed_h_px, method)
+                mode = self._PAD_MODES[method]
+                img = self.convertToFormat(self._paint_format())
+                new_img = pixels.pad_scaled(img, width, height, bleed_h_px,
+                                            bleed_h_px, bleed_w_px,
+                                            bleed_w_px, mode=mode)
+            else:
+                img = LcgImage(self._padded(bleed_w_px, bleed_h_px, method))
+                new_img = img.resampled(width, height, resample)
+
+        new_img.setDotsPerMeterX(round(width*1000/w_mm))
+        new_img.setDotsPerMeterY(round(height*1000/h_mm))
+        return self._derived(new_img)
+
+    def resampled(self, width, height, quality='fast'):
+        """Returns the image scaled to a size in pixels.
+
+        :param   width: width of returned image (pixels)
+        :param  height: height of returned image (pixels)
+        :param quality: resampling quality, 'fast', 'balanced' or 'best'
+        :return:        scaled image (resolution is not adjusted)
+        :rtype:         :class:`LcgImage`
+
+        Quality 'fast' scales the image with Qt's fast transformation, which
+        picks the nearest source pixel and may alias when downscaling.
+        Quality 'balanced' uses Qt's smooth transformation, which averages
+        source pixels when downscaling. Quality 'best' reduces the image by
+        averaging blocks of pixels and then resamples it with a Lanczos
+        filter (see :func:`lcgtools.pixels.resample`), which gives a
+        sharper result but is considerably slower; without numpy it is the
+        same as 'balanced'.
+
+        """
+        if quality not in ('fast', 'balanced', 'best'):
+            raise ValueError(f'Resample quality {quality} not supported')
+        size = QtCore.QSize(width, height)
+        if quality == 'best':
+            try:
+                pixels = _pixels()
+            except LcgException:
+                quality = 'balanced'
+            else:
+                img = self.convertToFormat(self._paint_format())
+                return self._derived(pixels.resample(img, width, height))
+        if quality == 'balanced':
+            return self._derived(self.scaled(size,
+                                             QtCore.Qt.IgnoreAspectRatio,
+                                             QtCore.Qt.SmoothTransformation))
+        return self._derived(self.scaled(size))
+
+    def _derived(self, image):
+        """Returns image processed from this image, as :class:`LcgImage`.
+
+        The returned image has the pending rotation of this image (see
+        :meth:`rotation`).
+
+        """
+        img = LcgImage(image)
+        img._rotation = self._rotation
+        return img
+
+    def _bleed_px(self, bleed):
+        """Returns pixels (horizontally, vertically) of bleed to add or crop.
+
+        :param bleed: amount of bleed (in mm)
+        :return:      tuple (bleed_w_px, bleed_h_px)
+
+        """
         w_px, h_px = self.width(), self.height()
-        w_mm = w_px*1000/self.dotsPerMeterX()
-        h_mm = h_px*1000/self.dotsPerMeterY()
+        w_mm, h_mm = self.widthMm(), self.heightMm()
         rel_bleed_w = bleed/(w_mm + 2*bleed)
         rel_bleed_h = bleed/(h_mm + 2*bleed)
-        bleed_w_px = int(w_px*rel_bleed_w)
-        bleed_h_px = int(h_px*rel_bleed_h)
+        return int(w_px*rel_bleed_w), int(h_px*rel_bleed_h)
+
+    def _check_bleed_px(self, bleed_w_px, bleed_h_px, method):
+        """Raises exception if bleed is too large for a mirroring method."""
+        _off = {'mirror': 0, 'reflect': 1}.get(method)
+        if _off is not None:
+            w_px, h_px = self.width(), self.height()
+            if bleed_w_px + _off > w_px or bleed_h_px + _off > h_px:
+                raise LcgException(f'Bleed too large for method {method}')
+
+    def _padded(self, bleed_w_px, bleed_h_px, method):
+        """Returns image padded with bleed pixels, see :meth:`addBleed`.
+
+        :param bleed_w_px: pixels to add on left and right side
+        :param bleed_h_px: pixels to add on top and bottom
+        :param     method: bleed method (as for :meth:`addBleed`)
+        :return:           padded image (resolution is not set)
+        :rtype:            :class:`PySide6.QtGui.QImage`
 
+        """
+        self._check_bleed_px(bleed_w_px, bleed_h_px, method)
+        mode = self._PAD_MODES[method]
+        if mode != 'edge':
+            try:
+                pixels = _pixels()
+            except LcgException:
+                pixels = None
+        elif method == 'numpy':
+            pixels = _pixels()
+        else:
+            pixels = None
+
+        if pixels:
+            img = self.convertToFormat(self._paint_format())
+            new_img = pixels.pad(img, bleed_h_px, bleed_h_px, bleed_w_px,
+                                 bleed_w_px, mode=mode)
+        elif mode == 'edge':
+            new_img = self._paint_bleed(bleed_w_px, bleed_h_px)
+        else:
+            new_img = self._paint_mirrored_bleed(bleed_w_px, bleed_h_px,
+                                                 reflect=(mode == 'reflect'))
+        return new_img
+
+    def _paint_bleed(self, bleed_w_px, bleed_h_px):
+        """Returns image with edge pixels painted onto added bleed.
+
+        :param bleed_w_px: pixels to add on left and right side
+        :param bleed_h_px: pixels to add on top and bottom
+        :return:           image with added bleed
+        :rtype:            :class:`PySide6.QtGui.QImage`
+
+        """
+        w_px, h_px = self.width(), self.height()
         new_width = w_px + 2*bleed_w_px
         new_height = h_px + 2*bleed_h_px
-        new_img = QtGui.QPixmap(new_width, new_height)
+        new_img = QtGui.QImage(new_width, new_height, self._paint_format())
         p = QtGui.QPainter(new_img)
         try:
+            # All pixels of the new image are drawn, replacing its contents
+            p.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
             p.drawImage(QtCore.QPoint(bleed_w_px, bleed_h_px), self)
 
             if bleed_w_px > 0:
                 # Add missing bleed from left/right side (pad vertically)
-                for xpos, offset in ((0, -bleed_w_px),
-                                     (w_px - 1, bleed_w_px)):
+                for xpos, x_target in ((0, 0),
+                                       (w_px - 1, bleed_w_px + w_px)):
                     pad_img = self.copy(QtCore.QRect(xpos, 0, 1, h_px))
-                    pad_brush = QtGui.QBrush(pad_img)
-                    x_origin, y_origin = xpos + bleed_w_px, bleed_h_px
-                    p.setBrushOrigin(x_origin, y_origin)
-                    p.fillRect(x_origin, bleed_h_px, offset, h_px, pad_brush)
+                    target = QtCore.QRect(x_target, bleed_h_px, bleed_w_px,
+                                          h_px)
+                    p.drawImage(target, pad_img)
 
             if bleed_h_px > 0:
                 # Add missing bleed from top/bottom side (pad horizontally)
-                for ypos, offset in ((0, -bleed_h_px),
-                                     (h_px - 1, bleed_h_px)):
+                for ypos, y_target in ((0, 0),
+                                       (h_px - 1, bleed_h_px + h_px)):
                     pad_img = self.copy(QtCore.QRect(0, ypos, w_px, 1))
-                    pad_brush = QtGui.QBrush(pad_img)
-                    x_origin, y_origin = bleed_w_px, ypos + bleed_h_px
-                    p.setBrushOrigin(x_origin, y_origin)
-                    p.fillRect(bleed_w_px, y_origin, w_px, offset, pad_brush)
+                    target = QtCore.QRect(bleed_w_px, y_target, w_px,
+                                          bleed_h_px)
+                    p.drawImage(target, pad_img)
 
             if min(bleed_w_px, bleed_h_px) > 0:
                 # Add missing bleed in corners
                 d_w, d_h = bleed_w_px, bleed_h_px
                 n_im_w, n_im_h = new_img.width(), new_img.height()
                 for params in ((0, 0, 0, 0),
-                               (n_im_w-d_w+1, 0, w_px-1, 0),
-                               (0, n_im_h-d_h+1, 0, h_px-1),
-                               (n_im_w-d_w+1, n_im_h-d_h+1, w_px-1, h_px-1)):
+                               (n_im_w-d_w, 0, w_px-1, 0),
+                               (0, n_im_h-d_h, 0, h_px-1),
+                               (n_im_w-d_w, n_im_h-d_h, w_px-1, h_px-1)):
                     xpos, ypos, cpick_x, cpick_y = params
-                    fill_color = self.pixel(cpick_x, cpick_y)
-                    p.fillRect(xpos, ypos, d_w, d_h, fill_color)
+                    pad_img = self.copy(QtCore.QRect(cpick_x, cpick_y, 1, 1))
+                    target = QtCore.QRect(xpos, ypos, d_w, d_h)
+                    p.drawImage(target, pad_img)
         finally:
-            # Painter must be destroyed before its target pixmap
+            # Painter must be destroyed before its target image
             del p
+        return new_img
 
-        # Return adjusted image with appropriate size
-        result = LcgImage(new_img.toImage())
-        result.setWidthMm(w_mm + 2*bleed)
-        result.setHeightMm(h_mm + 2*bleed)
-        return result
+    def _paint_mirrored_bleed(self, bleed_w_px, bleed_h_px, reflect=False):
+        """Returns image with mirrored pixels painted onto added bleed.
+
+        :param bleed_w_px: pixels to add on left and right side
+        :param bleed_h_px: pixels to add on top and bottom
+        :param    reflect: if True do not repeat the edge pixels
+        :return:           image with added bleed
+        :rtype:            :class:`PySide6.QtGui.QImage`
+
+        """
+        w_px, h_px = self.width(), self.height()
+        d_w, d_h = bleed_w_px, bleed_h_px
+        off = 1 if reflect else 0
+        new_img = QtGui.QImage(w_px + 2*d_w, h_px + 2*d_h,
+                               self._paint_format())
+        p = QtGui.QPainter(new_img)
+        try:
+            p.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+            p.drawImage(QtCore.QPoint(d_w, d_h), self)
+
+            def draw_flipped(painter, x, y, strip, horizontal):
+                # Flips strip around its center by a world transform, which
+                # for a pure flip maps each pixel exactly to another pixel
+                if horizontal:
+                    t = QtGui.QTransform(-1, 0, 0, 1, x + strip.width(), y)
+                else:
+                    t = QtGui.QTransform(1, 0, 0, -1, x, y + strip.height())
+                painter.setTransform(t)
+                painter.drawImage(QtCore.QPoint(0, 0), strip)
+                painter.resetTransform()
+
+            if d_w > 0:
+                # Mirror columns inside left/right edges
+                for x_src, x_target in ((off, 0),
+                                        (w_px - off - d_w, d_w + w_px)):
+                    strip = self.copy(QtCore.QRect(x_src, 0, d_w, h_px))
+                    draw_flipped(p, x_target, d_h, strip, True)
+
+            if d_h > 0:
+                # Mirror rows inside top/bottom edges, including side bleed
+                n_im_w = new_img.width()
+                for y_src, y_target in ((d_h + off, 0),
+                                        (h_px - off, d_h + h_px)):
+                    strip = new_img.copy(QtCore.QRect(0, y_src, n_im_w, d_h))
+                    draw_flipped(p, 0, y_target, strip, False)
+        finally:
+            # Painter must be destroyed before its target image
+            del p
+        return new_img
 
     def cropBleed(self, bleed):
         """Crops excess bleed for the image.
@@ -124,6 +446,25 @@ class LcgImage(QtGui.QImage):
         :return:       cropped image
         :rtype:        :class:`LcgImage`
 
+        """
+        return self._cropped(bleed)
+
+    def _cropped(self, bleed, view=False):
+        """Returns image with excess bleed cropped, see :meth:`cropBleed`.
+
+        :param bleed: amount of excess bleed to crop (in mm)
+        :param  view: if True return a view of the image's pixels
+        :return:      cropped image
+        :rtype:       :class:`LcgImage`
+
+        If *view* is True and the image has 32 bits per pixel, then the
+        cropped image is not copied, but shares the pixel buffer of this
+        image (starting at an offset into the buffer and with the same bytes
+        per line). The view keeps the pixel data alive, and modifying this
+        image afterwards does not change the view. Writing to the view
+        however writes to the pixels of this image, so a view must only be
+        read, e.g. for scaling it (as in :meth:`scaledWithBleed`).
+
         """
         if bleed < 0:
             raise ValueError('Bleed must be non-negative')
@@ -132,34 +473,81 @@ class LcgImage(QtGui.QImage):
 
         # Determine number of pixels to subtract vertically and horizontally
         w_px, h_px = self.width(), self.height()
-        w_mm, h_mm = self.widthMm(), self.heightMm()
-        rel_bleed_w = bleed/(w_mm + 2*bleed)
-        rel_bleed_h = bleed/(h_mm + 2*bleed)
-        bleed_w_px = int(w_px*rel_bleed_w)
-        bleed_h_px = int(h_px*rel_bleed_h)
+        bleed_w_px, bleed_h_px = self._bleed_px(bleed)
 
         # Copy appropriate image
         if max(bleed_w_px, bleed_h_px) == 0:
             return self
         new_w_px = w_px - 2*bleed_w_px
         new_h_px = h_px - 2*bleed_h_px
+        if view and self.depth() == 32:
+            return self._view(bleed_w_px, bleed_h_px, new_w_px, new_h_px)
         rect = QtCore.QRect(bleed_w_px, bleed_h_px, new_w_px, new_h_px)
-        return LcgImage(self.copy(rect))
+        return self._derived(self.copy(rect))
+
+    def _view(self, x, y, width, height):
+        """Returns a view of a rectangle of a 32-bit image (see
+        :meth:`_cropped`)."""
+        bpl = self.bytesPerLine()
+        offset = y*bpl + 4*x
+        size = height*bpl
+        if offset + size > self.sizeInBytes():
+            # Qt accesses bytes per line times height bytes of the buffer,
+            # which would run past the end of this image's buffer
+            rect = QtCore.QRect(x, y, width, height)
+            return self._derived(self.copy(rect))
+        buf = self.constBits()[offset:offset + size]
+        img = LcgImage(buf, width, height, bpl, self.format())
+        img._rotation = self._rotation
+        img.setDotsPerMeterX(self.dotsPerMeterX())
+        img.setDotsPerMeterY(self.dotsPerMeterY())
+        # A shallow copy holds a reference to the pixel data, so writing to
+        # this image detaches it rather than changing the view's pixels.
+        # The image itself holds any external buffer it wraps.
+        img._buffer = (self, QtGui.QImage(self))
+        return img
 
     def rotateClockwise(self):
         """Returns the image rotated 90 degrees clockwise."""
-        transform = QtGui.QTransform().rotate(90)
-        return LcgImage(self.transformed(transform))
+        return self.rotateRightAngle(90)
 
     def rotateAntiClockwise(self):
         """Returns the image rotated 90 degrees anticlockwise."""
-        transform = QtGui.QTransform().rotate(-90)
-        return LcgImage(self.transformed(transform))
+        return self.rotateRightAngle(270)
 
     def rotateHalfCircle(self):
         """Returns the image rotated 180 degrees."""
-        transform = QtGui.QTransform().rotate(180)
-        return LcgImage(self.transformed(transform))
+        return self.rotateRightAngle(180)
+
+    def rotateRightAngle(self, rotation):
+        """Returns the image rotated by a multiple of 90 degrees.
+
+        :param rotation: clockwise rotation in degrees (multiple of 90)
+        :return:         rotated image
+        :rtype:          :class:`LcgImage`
+
+        The image is rotated with an exact integer permutation matrix, for
+        which :meth:`QtGui.QImage.transformed` moves pixels without
+        resampling them. The result has the same format as the image, and
+        its horizontal and vertical dpi resolutions are swapped for 90 and
+        270 degree rotations so that its physical size is preserved. The
+        pending rotation (see :meth:`rotation`) is not applied.
+
+        """
+        if rotation % 90:
+            raise ValueError('Rotation must be a multiple of 90 degrees')
+        rotation %= 360
+        if rotation == 0:
+            return LcgImage(self.copy())
+        transform = QtGui.QTransform(*self._RIGHT_ANGLES[rotation], 0, 0)
+        img = self.transformed(transform)
+        if rotation == 180:
+            img.setDotsPerMeterX(self.dotsPerMeterX())
+            img.setDotsPerMeterY(self.dotsPerMeterY())
+        else:
+            img.setDotsPerMeterX(self.dotsPerMeterY())
+            img.setDotsPerMeterY(self.dotsPerMeterX())
+        return LcgImage(img)
 
     def widthMm(self):
         """Returns image width in millimeters."""
@@ -191,6 +579,57 @@ class LcgImage(QtGui.QImage):
         """
         self.setDotsPerMeterY(self.height()*1000/height)
 
+    @classmethod
+    def _fromSharedMemory(cls, shm, width, height, format, bpl, dpm_x, dpm_y,
+                          rotation=0):
+        """Returns image which wraps pixels in a shared memory block.
+
+        :param    shm: shared memory block holding the image pixels
+        :type     shm: :class:`multiprocessing.shared_memory.SharedMemory`
+        :param format: image format (value of :class:`QtGui.QImage.Format`)
+        :param    bpl: bytes per line of image data
+        :return:       image which uses the shared memory as its pixel buffer
+        :rtype:        :class:`LcgImage`
+
+        The image keeps a reference to *shm*, which is closed when the image
+        is garbage collected. Images derived from the returned image (e.g. by
+        scaling or copying) do not share its buffer. :class:`LcgImage`
+        copies keep a reference to *shm*, however plain copies of the
+        QImage must not outlive the returned image.
+
+        """
+        img = cls(shm.buf, width, height, bpl, QtGui.QImage.Format(format))
+        img.setDotsPerMeterX(dpm_x)
+        img.setDotsPerMeterY(dpm_y)
+        img.setRotation(rotation)
+        img._shm = shm
+        return img
+
+    def _toSharedMemory(self, shm):
+        """Copies image into a shared memory block.
+
+        :param shm: shared memory block to write to
+        :type  shm: :class:`multiprocessing.shared_memory.SharedMemory`
+        :return:    args for :meth:`_fromSharedMemory` (excluding *shm*)
+        :rtype:     tuple
+
+        """
+        img = self.convertToFormat(self._paint_format())
+        n_bytes = img.sizeInBytes()
+        if n_bytes > shm.size:
+            raise LcgException('Image too large for shared memory block')
+        shm.buf[:n_bytes] = img.constBits()
+        return (img.width(), img.height(), img.format().value,
+                img.bytesPerLine(), img.dotsPerMeterX(), img.dotsPerMeterY(),
+                self._rotation)
+
+    def _paint_format(self):
+        """Returns a QImage format which can hold this image when painted."""
+        if self.hasAlphaChannel():
+            return QtGui.QImage.Format_ARGB32_Premultiplied
+        else:
+            return QtGui.QImage.Format_RGB32
+
     def saveToBytes(self, format='PNG'):
         """Saves the image as a bytes object.
 
@@ -209,6 +648,130 @@ class LcgImage(QtGui.QImage):
             return qba.data()
 
 
+class LcgImageInfo(object):
+    """Information about an image file, read without decoding pixel data.
+
+    :param filename: image file name
+    :type  filename: str
+
+    Uses :class:`PySide6.QtGui.QImageReader` to read the image file header.
+    The dpi resolution is read from PNG and JPEG (JFIF) headers when the
+    header includes it.
+
+    """
+
+    def __init__(self, filename):
+        reader = QtGui.QImageReader(filename)
+        self._valid = reader.canRead()
+        if self._valid:
+            self._size = reader.size()
+            self._format = reader.imageFormat()
+            self._dpm = self._header_dots_per_meter(filename)
+        else:
+            self._size = QtCore.QSize()
+            self._format = QtGui.QImage.Format_Invalid
+            self._dpm = None
+
+    def isValid(self):
+        """Returns True if the file is an image which can be read."""
+        return self._valid
+
+    def size(self):
+        """Returns image size in pixels (invalid size if unknown)."""
+        return QtCore.QSize(self._size)
+
+    def width(self):
+        """Returns image width in pixels (-1 if unknown)."""
+        return self._size.width()
+
+    def height(self):
+        """Returns image height in pixels (-1 if unknown)."""
+        return self._size.height()
+
+    def format(self):
+        """Returns format of the image (if known without decoding)."""
+        return self._format
+
+    def dotsPerMeterX(self):
+        """Returns horizontal resolution (or None if not in header)."""
+        return self._dpm[0] if self._dpm else None
+
+    def dotsPerMeterY(self):
+        """Returns vertical resolution (or None if not in header)."""
+        return self._dpm[1] if self._dpm else None
+
+    def widthMm(self):
+        """Returns image width in millimeters (or None if unknown)."""
+        if self._dpm and self.width() > 0:
+            return self.width()*1000/self._dpm[0]
+        return None
+
+    def heightMm(self):
+        """Returns image height in millimeters (or None if unknown)."""
+        if self._dpm and self.height() > 0:
+            return self.height()*1000/self._dpm[1]
+        return None
+
+    @classmethod
+    def _header_dots_per_meter(cls, filename):
+        """Reads resolution from PNG or JPEG file header.
+
+        :return: tuple (dots_per_meter_x, dots_per_meter_y), or None
+
+        """
+        try:
+            with open(filename, 'rb') as f:
+                signature = f.read(8)
+                if signature == b'\x89PNG\r\n\x1a\n':
+                    return cls._png_dots_per_meter(f)
+                elif signature[:2] == b'\xff\xd8':
+                    f.seek(2)
+                    return cls._jpeg_dots_per_meter(f)
+        except (OSError, struct.error):
+            pass
+        return None
+
+    @classmethod
+    def _png_dots_per_meter(cls, f):
+        """Reads resolution from the pHYs chunk of a PNG file."""
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            length, chunk_type = struct.unpack('>I4s', chunk)
+            if chunk_type == b'pHYs':
+                dpm_x, dpm_y, unit = struct.unpack('>IIB', f.read(9))
+                if unit == 1 and dpm_x > 0 and dpm_y > 0:
+                    return dpm_x, dpm_y
+                return None
+            elif chunk_type in (b'IDAT', b'IEND'):
+                # pHYs must be located before image data
+                return None
+            f.seek(length + 4, os.SEEK_CUR)
+
+    @classmethod
+    def _jpeg_dots_per_meter(cls, f):
+        """Reads resolution from the JFIF APP0 segment of a JPEG file."""
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xff:
+                return None
+            if marker[1] in (0xd9, 0xda):
+                # End of image or start of scan
+                return None
+            length, = struct.unpack('>H', f.read(2))
+            segment = f.read(length - 2)
+            if marker[1] == 0xe0 and segment[:5] == b'JFIF\x00':
+                unit, d_x, d_y = struct.unpack('>BHH', segment[7:12])
+                if d_x == 0 or d_y == 0:
+                    return None
+                if unit == 1:
+                    return int(d_x/0.0254 + 0.5), int(d_y/0.0254 + 0.5)
+                elif unit == 2:
+                    return d_x*100, d_y*100
+                return None
+
+
 class LcgImageTransform(object):
     """Can perform a transform on a :class:`LcgImage`.
 
@@ -236,6 +799,51 @@ class LcgImageTransform(object):
         """
         raise NotImplementedError()
 
+    def key(self):
+        """Returns a string which identifies the transform and its settings.
+
+        :return: identifying string (or None if the transform has no key)
+        :rtype:  str
+
+        Two transforms with the same key must perform the same transform.
+        The key is used for caching transformed images, and images are not
+        cached for transforms without a key. Override this method to enable
+        caching.
+
+        """
+        return None
+
+    def transposes(self, info):
+        """Returns whether the transform swaps image width and height.
+
+        :param info: image file information
+        :type  info: :class:`LcgImageInfo`
+        :return:     True or False (or None if not known in advance)
+
+        Used for determining the orientation of the transformed image before
+        the image is decoded. Override this method if the result is known
+        from image file information.
+
+        """
+        return None
+
+    def rotation(self, image):
+        """Returns the rotation the transform performs on an image.
+
+        :param image: the image to transform
+        :type  image: :class:`LcgImage`
+        :return:      clockwise rotation in degrees (0, 90, 180 or 270), or
+                      None if the transform is not a pure rotation
+        :rtype:       int
+
+        If the transform is a pure rotation, the rotation can be applied when
+        drawing the image instead of transforming its pixels (see
+        :meth:`LcgCardPdfGenerator.loadCard`). Override this method if the
+        transform is a pure rotation.
+
+        """
+        return None
+
     def __call__(self, image):
         if not isinstance(image, QtGui.QImage):
             raise TypeError('Image must be QImage or derived class')
@@ -261,7 +869,23 @@ class LcgAspectRotation(LcgImageTransform):
         self._clockwise = clockwise
         self._physical = physical
 
-    def _transform(self, image):
+    def key(self):
+        return (f'LcgAspectRotation(portrait={self._portrait}, '
+                f'clockwise={self._clockwise}, physical={self._physical})')
+
+    def transposes(self, info):
+        width, height = info.width(), info.height()
+        if width < 0 or height < 0:
+            return None
+        if self._physical and info.dotsPerMeterX():
+            # Without header resolution, dpi is the same in both dimensions
+            width, height = info.widthMm(), info.heightMm()
+        if self._portrait:
+            return width > height
+        else:
+            return height > width
+
+    def rotation(self, image):
         rotate = False
         portrait = self._portrait
         if self._physical:
@@ -271,13 +895,226 @@ class LcgAspectRotation(LcgImageTransform):
             rotate |= portrait and (image.width() > image.height())
             rotate |= (not portrait) and (image.height() > image.width())
         if rotate:
-            if self._clockwise:
-                image = image.rotateClockwise()
-            else:
-                image = image.rotateAntiClockwise()
+            return 90 if self._clockwise else 270
+        return 0
+
+    def _transform(self, image):
+        rotation = self.rotation(image)
+        if rotation == 90:
+            image = image.rotateClockwise()
+        elif rotation == 270:
+            image = image.rotateAntiClockwise()
         return image
 
 
+class LcgPageLayout(object):
+    """Layout of cards on the pages of a card PDF document.
+
+    :param  pagesize: page size string ('a4', 'a3', 'letter' or 'tabloid')
+    :param       dpi: resolution of PDF document (dots per inch)
+    :param   c_width: card width in mm
+    :param  c_height: card height in mm
+    :param     bleed: card bleed in mm
+    :param    margin: page margin in mm, all sides
+    :param   spacing: minimum card spacing in mm
+    :param      fold: distance from card to fold line
+    :param    folded: if True foldable pages, if False 2-sided pages
+
+    All geometry is computed when the layout is created, and the layout
+    cannot be modified. Card slots, cut lines and fold lines are given in
+    device pixels of a PDF document with resolution *dpi*, without the
+    offset set with :meth:`LcgCardPdfGenerator.setTwosidedEvenPageOffset`.
+
+    Creating a layout does not require a PDF writer, so it can be used for
+    querying page geometry, e.g. the number of cards which fit on a page.
+    :class:`LcgCardPdfGenerator` draws pages by indexing into its layout,
+    see :attr:`LcgCardPdfGenerator.layout`.
+
+    """
+
+    _PAGE_SIZES = {'a4': QtGui.QPageSize.A4, 'letter': QtGui.QPageSize.Letter,
+                   'a3': QtGui.QPageSize.A3,
+                   'tabloid': QtGui.QPageSize.Tabloid}
+
+    def __init__(self, pagesize, dpi, c_width, c_height, bleed=3, margin=5,
+                 spacing=1, fold=3, folded=True):
+        self._dpi = dpi
+        self._folded = folded
+
+        # Page size, in landscape orientation
+        _size = self._PAGE_SIZES.get(pagesize.lower())
+        if _size is None:
+            raise LcgException(f'Unknown pagesize {pagesize}')
+        self._page_layout = QtGui.QPageLayout()
+        self._page_layout.setPageSize(_size)
+        self._page_layout.setOrientation(QtGui.QPageLayout.Landscape)
+        _rect = self._page_layout.fullRect(QtGui.QPageLayout.Millimeter)
+        page_width_mm = self._page_width_mm = _rect.width()
+        page_height_mm = self._page_height_mm = _rect.height()
+
+        # Calculate card spacing and positions - horizontally
+        c_tot_width = c_width + 2*bleed
+        avail_width = page_width_mm - (2*margin + c_tot_width + spacing)
+        if avail_width < 0:
+            raise LcgException('Cannot fit any cards in the width dimension')
+        cards_per_row = 1 + int(avail_width/(c_tot_width + spacing))
+        avail_width = page_width_mm - 2*margin
+        space_width = avail_width - cards_per_row*c_tot_width
+        xspace = space_width / (cards_per_row + 1)
+        xstart = margin + xspace
+
+        # Calculate card spacing and positions - vertically (2-sided)
+        c_tot_height = c_height + 2*bleed
+        avail_height = page_height_mm - (2*margin + c_tot_height + spacing)
+        if avail_height < 0:
+            raise LcgException('Cannot fit cards in the height dimension')
+        cards_per_col = 1 + int(avail_height/(c_tot_height + spacing))
+        avail_height = page_height_mm - 2*margin
+        space_height = avail_height - cards_per_col*c_tot_height
+        yspace = space_height / (cards_per_col + 1)
+        ystart = margin + yspace
+
+        w_px = self.mm_to_px(c_tot_width)
+        h_px = self.mm_to_px(c_tot_height)
+        x_0_px = self.mm_to_px(margin)
+        x_1_px = self.mm_to_px(page_width_mm - margin)
+        y_0_px = self.mm_to_px(margin)
+        y_1_px = self.mm_to_px(page_height_mm - margin)
+        x_mm = [xstart + i*(xspace + c_tot_width)
+                for i in range(cards_per_row)]
+
+        def _slot(x_mm, y_mm):
+            return QtCore.QRect(self.mm_to_px(x_mm), self.mm_to_px(y_mm),
+                                w_px, h_px)
+
+        def _hline(y_mm):
+            y_px = self.mm_to_px(y_mm)
+            return QtCore.QLine(x_0_px, y_px, x_1_px, y_px)
+
+        def _vline(x_mm):
+            x_px = self.mm_to_px(x_mm)
+            return QtCore.QLine(x_px, y_0_px, x_px, y_1_px)
+
+        if folded:
+            # One row of card fronts above the fold line, and a row of card
+            # backs below it. Vertical cut lines are drawn with each card.
+            if cards_per_col < 2:
+                raise LcgException('Cannot fit cards in the height dimension')
+            y_center = page_height_mm/2
+            front_ypos = y_center - fold - c_tot_height
+            back_ypos = y_center + fold
+            self._cards_per_col = 1
+            self._slots = tuple(_slot(x, front_ypos) for x in x_mm)
+            self._back_slots = tuple(_slot(x, back_ypos) for x in x_mm)
+            self._cut_lines = tuple(_hline(y + offset)
+                                    for y in (front_ypos + bleed,
+                                              back_ypos + bleed)
+                                    for offset in (0, c_height))
+            self._slot_cut_lines = tuple(tuple(_vline(x + offset)
+                                               for offset in
+                                               (bleed, bleed + c_width))
+                                         for x in x_mm)
+            self._fold_lines = (_hline(page_height_mm/2),)
+        else:
+            # Grid of cards, with cut lines across the page
+            y_mm = [ystart + i*(yspace + c_tot_height)
+                    for i in range(cards_per_col)]
+            self._cards_per_col = cards_per_col
+            self._slots = tuple(_slot(x, y) for y in y_mm for x in x_mm)
+            self._back_slots = self._slots
+            self._cut_lines = tuple(_hline(y + offset) for y in y_mm
+                                    for offset in (bleed, bleed + c_height))
+            self._cut_lines += tuple(_vline(x + offset) for x in x_mm
+                                     for offset in (bleed, bleed + c_width))
+            self._slot_cut_lines = ((),)*len(self._slots)
+            self._fold_lines = ()
+        self._cards_per_row = cards_per_row
+
+    def mm_to_px(self, offset_mm):
+        """Converts offset in mm to offset in pixels (using layout dpi)."""
+        return int(offset_mm*self._dpi/25.4)
+
+    @property
+    def page_layout(self):
+        """Page layout for a PDF writer (:class:`QtGui.QPageLayout`)."""
+        return QtGui.QPageLayout(self._page_layout)
+
+    @property
+    def page_width_mm(self):
+        """Page width in mm (landscape orientation)."""
+        return self._page_width_mm
+
+    @property
+    def page_height_mm(self):
+        """Page height in mm (landscape orientation)."""
+        return self._page_height_mm
+
+    @property
+    def dpi(self):
+        """Resolution of device pixels (dots per inch)."""
+        return self._dpi
+
+    @property
+    def folded(self):
+        """True if layout is for foldable pages, False if 2-sided."""
+        return self._folded
+
+    @property
+    def cards_per_row(self):
+        """Number of cards per row of a page."""
+        return self._cards_per_row
+
+    @property
+    def cards_per_col(self):
+        """Number of card rows per page (1 for foldable pages)."""
+        return self._cards_per_col
+
+    @property
+    def cards_per_page(self):
+        """Number of cards per page."""
+        return self._cards_per_row*self._cards_per_col
+
+    @property
+    def slots(self):
+        """Tuple of card rectangles on a page (:class:`QtCore.QRect`).
+
+        Slots are ordered by row, then column. For foldable pages this is
+        the card front sides, above the fold line.
+
+        """
+        return self._slots
+
+    @property
+    def back_slots(self):
+        """Tuple of card back side rectangles, indexed as :attr:`slots`.
+
+        For foldable pages these are below the fold line, for 2-sided pages
+        they are the same as :attr:`slots` (placed on even numbered pages).
+
+        """
+        return self._back_slots
+
+    @property
+    def cut_lines(self):
+        """Tuple of cut lines drawn once per page (:class:`QtCore.QLine`)."""
+        return self._cut_lines
+
+    @property
+    def slot_cut_lines(self):
+        """Tuple of cut lines drawn with each card, indexed as :attr:`slots`.
+
+        Each entry is a tuple of lines. For foldable pages these are the
+        vertical cut lines of the card, for 2-sided pages they are empty.
+
+        """
+        return self._slot_cut_lines
+
+    @property
+    def fold_lines(self):
+        """Tuple of fold lines (empty for 2-sided pages)."""
+        return self._fold_lines
+
+
 class LcgCardPdfGenerator(QtGui.QPdfWriter):
     """Generates PDF document from a set of inputs.
 
@@ -301,8 +1138,29 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
     adjustments for aligning front/back side prints for printers which do not
     align 2-sided printing perfectly.
 
+    Card images with identical content (e.g. a shared back side image) are
+    embedded in the PDF only once, and referenced from every place the image
+    is drawn.
+
+    Positions of cards and lines on pages are computed once, see
+    :attr:`layout`.
+
     """
 
+    # Number of recently drawn images kept for image deduplication, and
+    # number of rows sampled for an image's deduplication signature
+    _DEDUP_IMAGES = 8
+    _DEDUP_ROWS = 16
+
+    # Version of card image processing, included in image cache keys
+    _PROCESSING_VERSION = 3
+
+    # Image encoding estimates: strips of rows sampled every _SAMPLE_STEP
+    # rows, and the (fixed) JPEG quality used by the PDF writer
+    _SAMPLE_ROWS = 16
+    _SAMPLE_STEP = 256
+    _JPEG_QUALITY = 94
+
     def __init__(self, outfile, pagesize, dpi, c_width, c_height, bleed=3,
                  margin=5, spacing=1, fold=3, folded=True):
         self._done = False
@@ -325,6 +1183,11 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
         self._folded = folded
 
         self._feed_dir = 'portrait'
+        self._image_cache = None
+        self._bleed_method = 'simple'
+        self._resample = 'fast'
+        self._native = False
+        self._encoding = 'jpeg'
         self._odd = True
         self._even = True
         self._ex_offset = 0
@@ -334,63 +1197,34 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
         if pathlib.Path(self._outfile).exists():
             raise LcgException(f'Output file {self._outfile} already exists')
         self.setResolution(self._dpi)
-        layout = QtGui.QPageLayout()
-        if pagesize.lower() == 'a4':
-            _size = QtGui.QPageSize.A4
-        elif pagesize.lower() == 'letter':
-            _size = QtGui.QPageSize.Letter
-        elif pagesize.lower() == 'a3':
-            _size = QtGui.QPageSize.A3
-        elif pagesize.lower() == 'tabloid':
-            _size = QtGui.QPageSize.Tabloid
-        else:
-            raise LcgException(f'Unknown pagesize {pagesize}')
-        layout.setPageSize(_size)
-        layout.setOrientation(QtGui.QPageLayout.Landscape)
-        _pwm = layout.fullRect(QtGui.QPageLayout.Millimeter).width()
-        self._page_width_mm = _pwm
-        _phm = layout.fullRect(QtGui.QPageLayout.Millimeter).height()
-        self._page_height_mm = _phm
-        self.setPageLayout(layout)
-
-        # Calculate card spacing and positions - horizontally
+        self._layout = LcgPageLayout(pagesize, dpi, c_width, c_height,
+                                     bleed=bleed, margin=margin,
+                                     spacing=spacing, fold=fold,
+                                     folded=folded)
+        self.setPageLayout(self._layout.page_layout)
         self._card_current = 0
-        c_tot_width = self._c_width + 2*self._bleed
-        avail_width = self._page_width_mm
-        avail_width -= (2*self._margin + c_tot_width + self._spacing)
-        if avail_width < 0:
-            raise LcgException('Cannot fit any cards in the width dimension')
-        self._cards_per_row = 1 + int(avail_width/(c_tot_width+self._spacing))
-        avail_width = self._page_width_mm - 2*self._margin
-        space_width = avail_width - self._cards_per_row*c_tot_width
-        self._cards_xspace = space_width / (self._cards_per_row + 1)
-        self._cards_xstart = self._margin + self._cards_xspace
-
-
-        # Calculate card spacing and positions - vertically (2-sided)
-        c_tot_height = self._c_height + 2*self._bleed
-        avail_height = self._page_height_mm
-        avail_height -= (2*self._margin + c_tot_height + self._spacing)
-        if avail_height < 0:
-            raise LcgException('Cannot fit cards in the height dimension')
-        self._cards_per_col = 1 + int(avail_height/(c_tot_height+self._spacing))
-        avail_height = self._page_height_mm - 2*self._margin
-        space_height = avail_height - self._cards_per_col*c_tot_height
-        self._cards_yspace = space_height / (self._cards_per_col + 1)
-        self._cards_ystart = self._margin + self._cards_yspace
-        self._cards_per_page = self._cards_per_row*self._cards_per_col
-
-        if self._folded:
-            # Vertical positions for folded printing
-            if self._cards_per_col < 2:
-                raise LcgException('Cannot fit cards in the height dimension')
-            y_center = (self._page_height_mm/2)
-            self._cards_front_ypos = y_center - self._fold - c_tot_height
-            self._cards_back_ypos = y_center + self._fold
 
         # Cache of cards (front, back) to be printed for 2-sided printing
         self._card_cache = []
 
+        # Recently drawn images (signature, image) by cache key, and cache
+        # keys of drawn images mapped to the key of an identical image
+        self._drawn_images = OrderedDict()
+        self._drawn_keys = dict()
+        self._page_ops = None
+        self._back_page = None
+
+        # Painter calls for cut and fold lines (see _page_template)
+        self._cut_pen = QtGui.QPen('Black')
+        self._cut_pen.setWidth(5)
+        self._page_templates = dict()
+        self._dedup_count = 0
+        self._dedup_bytes = 0
+        self._native_count = 0
+        self._native_pixels = 0
+        self._card_count = 0
+        self._encoding_count = dict(jpeg=0, lossless=0)
+
         # Various properties
         self._current_page = 1
 
@@ -398,7 +1232,8 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
         if not self._done:
             self.abort()
 
-    def loadCard(self, image, trans=None, bleed=0, adjust=True):
+    def loadCard(self, image, trans=None, bleed=0, adjust=True,
+                 defer_rotation=False):
         """Load card from image and generate scaled QImage with required bleed.
 
         :param    image: image or file name of image
@@ -408,233 +1243,584 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
         :type     trans: :class:`lcgtools.graphics.LcgImageTransform`
         :param    bleed: amount of bleed already existing on image (mm)
         :param   adjust: adjust image to get target bleed set on generator
+        :param defer_rotation: if True defer rotation by *trans* to drawing
         :return:         loaded and processed image
         :rtype:          :class:`LcgImage`
 
         The image is scaled to the correct width and height in pixels to match
         the card size (including bleed) with the dpi resolution set on the
-        PDF generator.
+        PDF generator. Image files in formats which support it (e.g. JPEG) are
+        decoded directly at a reduced size near the target size. Missing
+        bleed is added with the method set with :meth:`setBleedMethod`, and
+        images are scaled with the quality set with
+        :meth:`setResampleQuality`. If native resolution is enabled with
+        :meth:`setNativeResolution`, images with a resolution at or below
+        the PDF resolution are not scaled.
+
+        If *defer_rotation* is True and *trans* is a pure rotation (see
+        :meth:`LcgImageTransform.rotation`), then the image pixels are not
+        rotated. Instead the returned image has a pending rotation (see
+        :meth:`LcgImage.rotation`), which :meth:`drawCard` applies when
+        drawing the image.
+
+        The method does not modify the generator, and may be called from
+        worker threads (see :class:`LcgCardLoader`).
+
+        If an image cache has been set with :meth:`setImageCache` and *image*
+        is a file name, then a previously processed image is loaded from the
+        cache if available, and otherwise the processed image is added to the
+        cache.
 
         """
-        c_tot_width_mm = self._c_width + 2*self._bleed
-        c_tot_height_mm = self._c_height + 2*self._bleed
-        w_px = self.mm_to_px(c_tot_width_mm)
-        h_px = self.mm_to_px(c_tot_height_mm)
+        return self._load_card(self._card_params(), image, trans=trans,
+                               bleed=bleed, adjust=adjust,
+                               defer_rotation=defer_rotation,
+                               cache=self._image_cache)
+
+    def _card_params(self):
+        """Returns card parameters for :meth:`_load_card`.
+
+        :return: tuple (c_width, c_height, bleed, dpi, bleed_method,
+                 resample, native) of generator settings
+
+        The parameters can be pickled, so that cards can be loaded by
+        :meth:`_load_card` in another process.
+
+        """
+        return (self._c_width, self._c_height, self._bleed, self._dpi,
+                self._bleed_method, self._resample, self._native)
+
+    @classmethod
+    def _load_card(cls, params, image, trans=None, bleed=0, adjust=True,
+                   defer_rotation=False, cache=None):
+        """Implements :meth:`loadCard` for card parameters from
+        :meth:`_card_params`."""
+        if trans and not isinstance(trans, LcgImageTransform):
+            raise TypeError('trans argument must be LcgImageTransform')
+        key = None
+        if (cache and not isinstance(image, QtGui.QImage)
+            and (trans is None or trans.key() is not None)):
+            trans_key = trans.key() if trans else None
+            key = cache.key(image, cls._PROCESSING_VERSION, params, bleed,
+                            adjust, trans_key, defer_rotation)
+            if key:
+                with _span('cache', image):
+                    img = cache.get(key)
+                if img is not None:
+                    return img
+
+        img = cls._process_card(params, image, trans=trans, bleed=bleed,
+                                adjust=adjust, defer_rotation=defer_rotation)
+        if key:
+            with _span('cache_put', image):
+                cache.put(key, img)
+        return img
+
+    @classmethod
+    def _process_card(cls, params, image, trans=None, bleed=0, adjust=True,
+                      defer_rotation=False):
+        """Loads and processes a card image (without using any cache)."""
+        (c_width, c_height, t_bleed, dpi, bleed_method, resample,
+         native) = params
+        c_tot_width_mm = c_width + 2*t_bleed
+        c_tot_height_mm = c_height + 2*t_bleed
+        w_px = int(c_tot_width_mm*dpi/25.4)
+        h_px = int(c_tot_height_mm*dpi/25.4)
 
         if isinstance(image, QtGui.QImage):
+            card = None
             if isinstance(image, LcgImage):
-                img = image
+                img = image.applyRotation()
             else:
                 img = LcgImage(image)
         else:
-            img = LcgImage(image)
+            card = image
+            with _span('decode', card):
+                img = cls._read_card_image(params, image, trans=trans,
+                                           bleed=bleed, adjust=adjust)
             if img.isNull():
                 raise LcgException(f'Could not load as QImage: "{image}"')
-        if trans:
-            if not isinstance(trans, LcgImageTransform):
-                raise TypeError('trans argument must be LcgImageTransform')
-            img = trans(img)
-        img.setWidthMm(self._c_width + 2*bleed)
-        img.setHeightMm(self._c_height + 2*bleed)
-        if adjust:
-            delta_bleed = self._bleed - bleed
-            if delta_bleed > 0:
-                img = img.addBleed(delta_bleed)
-            elif delta_bleed < 0:
-                img = img.cropBleed(-delta_bleed)
-
-        # Return image scaled to required dimensions for PDF paint device
-        img = img.scaled(QtCore.QSize(w_px, h_px))
-        return LcgImage(img)
+        rotation = trans.rotation(img) if trans and defer_rotation else None
+        if trans and rotation is None:
+            with _span('transform', card):
+                img = trans(img)
+        rotation = rotation or 0
+        if rotation in (90, 270):
+            # Pixels keep their orientation, which is transposed to the card's
+            w_px, h_px = h_px, w_px
+            img.setWidthMm(c_height + 2*bleed)
+            img.setHeightMm(c_width + 2*bleed)
+        else:
+            img.setWidthMm(c_width + 2*bleed)
+            img.setHeightMm(c_height + 2*bleed)
+        delta_bleed = t_bleed - bleed if adjust else 0
+
+        # Keep image resolution if it is not higher than the PDF resolution
+        native_img = None
+        if native:
+            w_mm, h_mm = img.widthMm(), img.heightMm()
+            if (img.width()*(w_mm + 2*delta_bleed) <= w_px*w_mm and
+                img.height()*(h_mm + 2*delta_bleed) <= h_px*h_mm):
+                with _span('bleed', card):
+                    if delta_bleed > 0:
+                        native_img = img.addBleed(delta_bleed,
+                                                  method=bleed_method)
+                    elif delta_bleed < 0:
+                        native_img = img.cropBleed(-delta_bleed)
+                    else:
+                        native_img = img
+                if (native_img.width() > w_px or
+                    native_img.height() > h_px):
+                    native_img = None
+
+        if native_img is not None:
+            img = native_img
+        else:
+            # Scale image to required dimensions for PDF paint device, adding
+            # or cropping bleed in the same pass
+            with _span('scale', card):
+                img = img.scaledWithBleed(w_px, h_px, delta_bleed,
+                                          method=bleed_method,
+                                          resample=resample)
+        img.setRotation(rotation)
+        return img
+
+    @classmethod
+    def _read_card_image(cls, params, filename, trans=None, bleed=0,
+                         adjust=True):
+        """Reads image file for :meth:`_process_card`.
+
+        If the image format supports decoding to a smaller size (e.g. JPEG
+        DCT-domain downscaling), then the image is decoded at (or slightly
+        above) the size it will be scaled to by :meth:`_process_card`, or
+        twice that size for resample quality 'best'. The dpi resolution of
+        the image is adjusted so that its physical size is the same as that
+        of the full size image.
 
-    def drawCard(self, front=None, back=None):
+        """
+        reader = QtGui.QImageReader(filename)
+        src_size = reader.size()
+        _opt = QtGui.QImageIOHandler.ImageOption.ScaledSize
+        if not reader.supportsOption(_opt) or src_size.isEmpty():
+            return LcgImage(reader.read())
+
+        # Determine image size which will be scaled to target size
+        c_width, c_height, t_bleed, dpi, _, resample, _ = params
+        w_px = int((c_width + 2*t_bleed)*dpi/25.4)
+        h_px = int((c_height + 2*t_bleed)*dpi/25.4)
+        if resample == 'best':
+            # Leave the final downscaling to the resampling filter
+            w_px, h_px = 2*w_px, 2*h_px
+        if adjust:
+            w_px = math.ceil(w_px*(c_width + 2*bleed)/(c_width + 2*t_bleed))
+            h_px = math.ceil(h_px*(c_height + 2*bleed)/(c_height + 2*t_bleed))
+        if trans:
+            transposed = trans.transposes(LcgImageInfo(filename))
+            if transposed is None:
+                return LcgImage(reader.read())
+            elif transposed:
+                w_px, h_px = h_px, w_px
+
+        if w_px >= src_size.width() or h_px >= src_size.height():
+            return LcgImage(reader.read())
+        reader.setScaledSize(QtCore.QSize(w_px, h_px))
+        img = LcgImage(reader.read())
+        if not img.isNull():
+            dpm_x = img.dotsPerMeterX()*img.width()/src_size.width()
+            dpm_y = img.dotsPerMeterY()*img.height()/src_size.height()
+            img.setDotsPerMeterX(round(dpm_x))
+            img.setDotsPerMeterY(round(dpm_y))
+        return img
+
+    def drawCard(self, front=None, back=None, front_rotation=0,
+                 back_rotation=0):
         """Draws a new card onto the PDF.
 
-        :param front: image or color for front side of card
-        :type  front: :class:`PySide6.QtGui.PySide6.QtGui.QImage` or
-                      :class:`PySide6.QtGui.PySide6.QtGui.QColor`
-        :param  back: image or color for back side of card
-        :type  front: :class:`PySide6.QtGui.PySide6.QtGui.QImage` or
-                      :class:`PySide6.QtGui.PySide6.QtGui.QColor`
+        :param          front: image or color for front side of card
+        :type           front: :class:`PySide6.QtGui.PySide6.QtGui.QImage` or
+                               :class:`PySide6.QtGui.PySide6.QtGui.QColor`
+        :param           back: image or color for back side of card
+        :type            back: :class:`PySide6.QtGui.PySide6.QtGui.QImage` or
+                               :class:`PySide6.QtGui.PySide6.QtGui.QColor`
+        :param front_rotation: clockwise rotation of front image (degrees)
+        :param  back_rotation: clockwise rotation of back image (degrees)
 
         For each card side parameter, if it is a QImage, then that image
         is used for the card side, and it is assumed to include required bleed.
+        An image with a different size in pixels than the card (e.g. an image
+        loaded at native resolution) is scaled by the painter when drawn.
         If the parameter is an a QColor, then a rectangle of that solid color
         is drawn instead. If it is None then a white rectangle is drawn.
 
-        """
-        if self._folded:
-            self._draw_card_folded(front=front, back=back)
-        else:
-            self._card_cache.append((front, back))
-            if len(self._card_cache) == self._cards_per_page:
-                self._flush_card_cache()
+        A card side may also be a lazy card reference, i.e. a callable
+        without arguments which returns the card side (e.g. a function
+        which loads the image). The reference is only called if the side is
+        drawn; with 2-sided printing, sides on pages which are excluded with
+        :meth:`setTwosidedSubset` are never resolved or drawn.
 
-    def _draw_card_folded(self, front=None, back=None, _force=False):
-        if self._card_current == self._cards_per_row:
+        Rotations must be a multiple of 90 degrees, and are added to any
+        pending rotation of an :class:`LcgImage` (see
+        :meth:`LcgImage.rotation`). Images are rotated by the painter when
+        they are drawn, without transforming their pixels. An image which is
+        rotated 90 or 270 degrees must have transposed dimensions, i.e. its
+        height must match the card's width.
+
+        """
+        front = self._resolve_side(front, self.draws_fronts)
+        back = self._resolve_side(back, self.draws_backs)
+        front_rotation = self._side_rotation(front, front_rotation)
+        back_rotation = self._side_rotation(back, back_rotation)
+        self._card_count += 1
+        with _span('draw'):
+            if self._folded:
+                self._draw_card_folded(front=front, back=back,
+                                       front_rotation=front_rotation,
+                                       back_rotation=back_rotation)
+            else:
+                self._card_cache.append((front, back, front_rotation,
+                                         back_rotation))
+                if len(self._card_cache) == self._layout.cards_per_page:
+                    self._flush_card_cache()
+
+    @staticmethod
+    def _resolve_side(card_side, drawn):
+        """Returns card side to draw, resolving a lazy card reference."""
+        if not drawn:
+            return None
+        if callable(card_side):
+            return card_side()
+        return card_side
+
+    def _side_rotation(self, card_side, rotation):
+        """Returns total rotation for drawing a card side."""
+        if rotation % 90:
+            raise ValueError('Rotation must be a multiple of 90 degrees')
+        if isinstance(card_side, LcgImage):
+            rotation += card_side.rotation()
+        return rotation % 360
+
+    def _draw_card_folded(self, front=None, back=None, front_rotation=0,
+                          back_rotation=0, _force=False):
+        layout = self._layout
+        if self._card_current == layout.cards_per_page:
             # Start new PDF page
             self.newPage()
             self._current_page += 1
             self._card_current = 0
-        if self._current_page % 2 == 1:
-            off_x, off_y = 0, 0
-        else:
-            off_x = self.mm_to_px(self._ex_offset)
-            off_y = self.mm_to_px(self._ey_offset)
+        offset = self._page_offset()
+        page_ops, slot_ops = self._page_template()
 
         painter = self.painter()
 
+        # Draw fold line and horizontal cut lines
         if self._card_current == 0:
-            x_0_px = self.mm_to_px(self._margin)
-            x_1_px = self.mm_to_px(self._page_width_mm - self._margin)
-
-            if self._folded:
-                # Draw fold line
-                pen = QtGui.QPen('Black')
-                pen.setWidth(2)
-                pen.setStyle(QtCore.Qt.DotLine)
-                painter.setPen(pen)
-                y_px = self.mm_to_px(self._page_height_mm/2)
-                painter.drawLine(x_0_px + off_x, y_px + off_y,
-                                 x_1_px + off_x, y_px + off_y)
-
-            # Draw horizontal cut lines
-            pen = QtGui.QPen('Black')
-            pen.setWidth(2)
-            painter.setPen(pen)
-            for card_y_mm in self._cards_front_ypos, self._cards_back_ypos:
-                card_y_mm += self._bleed
-                for y_mm in card_y_mm, card_y_mm + self._c_height:
-                    y_px = self.mm_to_px(y_mm)
-                    painter.drawLine(x_0_px + off_x, y_px + off_y,
-                                     x_1_px + off_x, y_px + off_y)
-
-        # Calculate position and width info for front and back images
-        c_tot_width_mm = self._c_width + 2*self._bleed
-        c_tot_height_mm = self._c_height + 2*self._bleed
-        w_px = self.mm_to_px(c_tot_width_mm)
-        h_px = self.mm_to_px(c_tot_height_mm)
-        x_mm = self._cards_xstart
-        x_mm += self._card_current*(self._cards_xspace + c_tot_width_mm)
-        x_px = self.mm_to_px(x_mm)
+            self._replay(painter, page_ops)
 
         # Draw vertical cut lines
-        pen = QtGui.QPen('Black')
-        pen.setWidth(5)
-        painter.setPen(pen)
-        y_0_px = self.mm_to_px(self._margin)
-        y_1_px = self.mm_to_px(self._page_height_mm - self._margin)
-        for x_offset in self._bleed, self._bleed + self._c_width:
-            x_px = self.mm_to_px(x_mm + x_offset)
-            painter.drawLine(x_px + off_x, y_0_px + off_y,
-                             x_px + off_x, y_1_px + off_y)
+        if painter.pen() != self._cut_pen:
+            self._paint(painter, 'setPen', self._cut_pen)
+        self._replay(painter, slot_ops[self._card_current])
 
         # Draw card front and back side
-        for card_side, y_mm in ((front, self._cards_front_ypos),
-                                (back, self._cards_back_ypos)):
-            x_px = self.mm_to_px(x_mm)
-            y_px = self.mm_to_px(y_mm)
-            if card_side is None:
-                card_side = QtGui.QColor('White')
-            if isinstance(card_side, QtGui.QImage):
-                img = card_side
-                img_pos = QtCore.QPoint(x_px + off_x, y_px + off_y)
-                painter.drawImage(img_pos, img)
-            elif isinstance(card_side, QtGui.QColor):
-                pen = QtGui.QPen('Black')
-                pen.setWidth(5)
-                painter.setPen(pen)
-                old_brush = painter.brush()
-                brush = QtGui.QBrush()
-                brush.setColor(card_side)
-                brush.setStyle(QtCore.Qt.SolidPattern)
-                painter.setBrush(brush)
-                pen = QtGui.QPen('Black')
-                painter.drawRect(x_px + off_x, y_px + off_y, w_px, h_px)
-                painter.setBrush(old_brush)
-            else:
-                raise TypeError('Must be QImage or QColor')
+        for card_side, rotation, rect in ((front, front_rotation,
+                                           layout.slots[self._card_current]),
+                                          (back, back_rotation,
+                                           layout.back_slots[
+                                               self._card_current])):
+            self._draw_card_side(painter, card_side, rotation,
+                                 rect.translated(offset))
 
         self._card_current += 1
 
-    def _draw_card_two_sided(self, card_side):
+    def _draw_card_two_sided(self, card_side, rotation=0):
+        layout = self._layout
         # Add page when needed
-        if self._card_current == self._cards_per_page:
+        if self._card_current == layout.cards_per_page:
             # Start new PDF page
             self.newPage()
             self._current_page += 1
             self._card_current = 0
-        if self._current_page % 2 == 1:
-            off_x, off_y = 0, 0
-        else:
-            off_x = self.mm_to_px(self._ex_offset)
-            off_y = self.mm_to_px(self._ey_offset)
-
-        # Set various parameters
-        c_tot_width_mm = self._c_width + 2*self._bleed
-        c_tot_height_mm = self._c_height + 2*self._bleed
-        w_px = self.mm_to_px(c_tot_width_mm)
-        h_px = self.mm_to_px(c_tot_height_mm)
-        c_row = self._card_current // self._cards_per_row
-        c_col = self._card_current % self._cards_per_row
-        x_mm = self._cards_xstart
-        x_mm += c_col*(self._cards_xspace + c_tot_width_mm)
-        y_mm = self._cards_ystart
-        y_mm += c_row*(self._cards_yspace + c_tot_height_mm)
-        y_px = self.mm_to_px(y_mm)
+        offset = self._page_offset()
 
         painter = self.painter()
 
         # Draw cut lines
         if self._card_current == 0:
-            pen = QtGui.QPen('Black')
-            pen.setWidth(5)
-            painter.setPen(pen)
-
-            x_0_px = self.mm_to_px(self._margin)
-            x_1_px = self.mm_to_px(self._page_width_mm - self._margin)
-            for i in range(self._cards_per_col):
-                for y_offset in self._bleed, self._bleed + self._c_height:
-                    line_y_mm = self._cards_ystart
-                    line_y_mm += i*(self._cards_yspace + c_tot_height_mm)
-                    y_px = self.mm_to_px(line_y_mm + y_offset)
-                    painter.drawLine(x_0_px + off_x, y_px + off_y,
-                                     x_1_px + off_x, y_px + off_y)
-
-            y_0_px = self.mm_to_px(self._margin)
-            y_1_px = self.mm_to_px(self._page_height_mm - self._margin)
-            for i in range(self._cards_per_row):
-                for x_offset in self._bleed, self._bleed + self._c_width:
-                    line_x_mm = self._cards_xstart
-                    line_x_mm += i*(self._cards_xspace + c_tot_width_mm)
-                    x_px = self.mm_to_px(line_x_mm + x_offset)
-                    painter.drawLine(x_px + off_x, y_0_px + off_y,
-                                     x_px + off_x, y_1_px + off_y)
+            self._replay(painter, self._page_template()[0])
 
         # Draw card image
-        x_px = self.mm_to_px(x_mm)
-        y_px = self.mm_to_px(y_mm)
+        rect = layout.slots[self._card_current].translated(offset)
+        self._draw_card_side(painter, card_side, rotation, rect)
+        self._card_current += 1
+
+    def _page_template(self):
+        """Returns painter calls for drawing cut and fold lines on a page.
+
+        :return: tuple (page_ops, slot_ops) of painter calls for the page,
+                 and a tuple of painter calls for each card slot
+        :rtype:  tuple
+
+        Painter calls are generated once per job for odd and even numbered
+        pages (which may have different offsets), and replayed for each
+        page. All lines drawn with the same pen are drawn in a single call,
+        which writes them to the PDF as a single stroked path.
+
+        """
+        offset = self._page_offset()
+        key = (offset.x(), offset.y())
+        if key not in self._page_templates:
+            layout = self._layout
+            page_ops = []
+            if layout.fold_lines:
+                pen = QtGui.QPen('Black')
+                pen.setWidth(2)
+                pen.setStyle(QtCore.Qt.DotLine)
+                page_ops.append(('setPen', (pen,)))
+                page_ops.append(('drawLines', ([line.translated(offset) for
+                                                line in layout.fold_lines],)))
+            if layout.folded:
+                # Horizontal cut lines are thinner than vertical cut lines
+                pen = QtGui.QPen('Black')
+                pen.setWidth(2)
+            else:
+                pen = self._cut_pen
+            page_ops.append(('setPen', (pen,)))
+            page_ops.append(('drawLines', ([line.translated(offset) for
+                                            line in layout.cut_lines],)))
+            slot_ops = tuple(((('drawLines', ([line.translated(offset)
+                                               for line in lines],)),)
+                              if lines else ())
+                             for lines in layout.slot_cut_lines)
+            self._page_templates[key] = (tuple(page_ops), slot_ops)
+        return self._page_templates[key]
+
+    def _replay(self, painter, ops):
+        """Performs a sequence of (method, args) painter calls."""
+        for method, args in ops:
+            self._paint(painter, method, *args)
+
+    def _page_offset(self):
+        """Returns drawing offset for the current page (in pixels)."""
+        if self._current_page % 2 == 1:
+            return QtCore.QPoint(0, 0)
+        return QtCore.QPoint(self.mm_to_px(self._ex_offset),
+                             self.mm_to_px(self._ey_offset))
+
+    def _draw_card_side(self, painter, card_side, rotation, rect):
+        """Draws a card side image or color into a card slot rectangle."""
         if card_side is None:
             card_side = QtGui.QColor('White')
         if isinstance(card_side, QtGui.QImage):
-            img = card_side
-            img_pos = QtCore.QPoint(x_px + off_x, y_px + off_y)
-            painter.drawImage(img_pos, img)
+            self._draw_image(painter, rect, card_side, rotation)
         elif isinstance(card_side, QtGui.QColor):
-            pen = QtGui.QPen('Black')
-            pen.setWidth(5)
-            painter.setPen(pen)
+            self._paint(painter, 'setPen', self._cut_pen)
             old_brush = painter.brush()
             brush = QtGui.QBrush()
             brush.setColor(card_side)
             brush.setStyle(QtCore.Qt.SolidPattern)
-            painter.setBrush(brush)
-            pen = QtGui.QPen('Black')
-            painter.drawRect(x_px + off_x, y_px + off_y, w_px, h_px)
-            painter.setBrush(old_brush)
+            self._paint(painter, 'setBrush', brush)
+            self._paint(painter, 'drawRect', rect)
+            self._paint(painter, 'setBrush', old_brush)
         else:
             raise TypeError('Must be QImage or QColor')
-        self._card_current += 1
+
+    def _draw_image(self, painter, rect, img, rotation=0):
+        """Draws image, reusing any previously drawn identical image.
+
+        The PDF writer embeds the pixel data of an image object (identified by
+        its :meth:`QtGui.QImage.cacheKey`) only once, and references the
+        embedded data if the same image is drawn again. If the image has the
+        same content as a recently drawn image, that image is drawn instead
+        so that the PDF references its embedded data. Images are looked up by
+        cache key first, and an image which was not drawn before is only
+        compared in full with recent images of the same signature (see
+        :meth:`_dedup_signature`).
+
+        The image is drawn into *rect*. If *rotation* is set, the image is
+        rotated clockwise by setting the painter transform, and the PDF then
+        references the same embedded data for all rotations. If the (rotated)
+        image size differs from the size of *rect*, the painter scales it,
+        and the PDF embeds the image at its own resolution.
+
+        """
+        key = img.cacheKey()
+        drawn_key = self._drawn_keys.get(key)
+        if drawn_key is None:
+            # Only images with the same signature are compared in full
+            signature = self._dedup_signature(img)
+            for _key, (_signature, _img) in self._drawn_images.items():
+                if _signature == signature and _img == img:
+                    # A different image object with identical content, which
+                    # the PDF writer would otherwise embed again
+                    drawn_key = _key
+                    self._dedup_count += 1
+                    self._dedup_bytes += _img.sizeInBytes()
+                    break
+        if rotation in (90, 270):
+            t_width, t_height = rect.height(), rect.width()
+        else:
+            t_width, t_height = rect.width(), rect.height()
+        if drawn_key is not None:
+            self._drawn_images.move_to_end(drawn_key)
+            img = self._drawn_images[drawn_key][1]
+            self._drawn_keys[key] = drawn_key
+        else:
+            self._drawn_images[key] = (signature, img)
+            self._drawn_keys[key] = key
+            if len(self._drawn_images) > self._DEDUP_IMAGES:
+                _key, _ = self._drawn_images.popitem(last=False)
+                self._drawn_keys = {k: v for k, v in self._drawn_keys.items()
+                                    if v != _key}
+            if self._encoding == 'auto':
+                lossless = self._lossless_smaller(img)
+                if painter.testRenderHint(_LOSSLESS) != lossless:
+                    self._paint(painter, 'setRenderHint', _LOSSLESS, lossless)
+            else:
+                lossless = (self._encoding == 'lossless')
+            self._encoding_count['lossless' if lossless else 'jpeg'] += 1
+            n_pixels = img.width()*img.height()
+            if n_pixels < t_width*t_height:
+                self._native_count += 1
+                self._native_pixels += t_width*t_height - n_pixels
+        scaled = (img.width(), img.height()) != (t_width, t_height)
+        if not rotation:
+            target = rect if scaled else rect.topLeft()
+            self._paint(painter, 'drawImage', target, img)
+            return
+        if rotation == 90:
+            offset = (rect.width(), 0)
+        elif rotation == 180:
+            offset = (rect.width(), rect.height())
+        elif rotation == 270:
+            offset = (0, rect.height())
+        else:
+            raise ValueError('Rotation must be 0, 90, 180 or 270 degrees')
+        old_transform = painter.worldTransform()
+        transform = QtGui.QTransform(old_transform)
+        transform.translate(rect.x() + offset[0], rect.y() + offset[1])
+        transform.rotate(rotation)
+        if scaled:
+            target = QtCore.QRect(0, 0, t_width, t_height)
+        else:
+            target = QtCore.QPoint(0, 0)
+        self._paint(painter, 'setWorldTransform', transform)
+        self._paint(painter, 'drawImage', target, img)
+        self._paint(painter, 'setWorldTransform', old_transform)
+
+    @classmethod
+    def _dedup_signature(cls, img):
+        """Returns a signature of an image for image deduplication.
+
+        The signature holds the image geometry and a digest of a few rows
+        sampled from the image, so that images which differ are nearly
+        always told apart without reading (or hashing) all of their pixels.
+
+        """
+        height, rows = img.height(), cls._DEDUP_ROWS
+        n_bytes = (img.width()*img.depth() + 7)//8
+        h = hashlib.blake2b(digest_size=16)
+        for y in sorted({i*height//rows for i in range(rows)}):
+            h.update(img.constScanLine(y)[:n_bytes])
+        return (img.width(), height, img.format().value, img.colorTable(),
+                h.digest())
+
+    @classmethod
+    def _lossless_smaller(cls, img):
+        """Returns True if lossless encoding of an image is not larger.
+
+        The sizes of the image encoded by the PDF writer with lossless
+        (deflate) and JPEG compression are estimated by compressing strips
+        of rows sampled from the image, which estimates the entropy of the
+        image content. Graphics with flat colors and text typically compress
+        better with lossless encoding, whereas photographic art compresses
+        better as JPEG.
+
+        """
+        rows = cls._SAMPLE_ROWS
+        strips = range(0, max(img.height() - rows, 0) + 1, cls._SAMPLE_STEP)
+        sample = QtGui.QImage(img.width(), rows*len(strips),
+                              QtGui.QImage.Format_RGB888)
+        painter = QtGui.QPainter(sample)
+        for i, y in enumerate(strips):
+            painter.drawImage(0, i*rows, img, 0, y, img.width(), rows)
+        painter.end()
+        lossless_bytes = len(zlib.compress(sample.constBits()))
+        buf = QtCore.QBuffer()
+        buf.open(QtCore.QIODevice.WriteOnly)
+        sample.save(buf, 'JPEG', cls._JPEG_QUALITY)
+        jpeg_bytes = buf.data().size()
+        return lossless_bytes <= jpeg_bytes
+
+    def _paint(self, painter, method, *args):
+        """Calls a painter method, recording the call if recording a page."""
+        if self._page_ops is not None:
+            self._page_ops.append((method, args))
+        getattr(painter, method)(*args)
+
+    def _stamp_page(self, ops):
+        """Draws a new 2-sided mode page by replaying recorded painter calls.
+
+        :param ops: painter calls recorded while drawing a page with
+                    :meth:`_draw_card_two_sided`
+
+        Images are drawn with the same image objects as the recorded page, so
+        the PDF references the image data embedded for that page.
+
+        """
+        if self._card_current == self._layout.cards_per_page:
+            self.newPage()
+            self._current_page += 1
+        painter = self.painter()
+        for method, args in ops:
+            getattr(painter, method)(*args)
+        self._card_current = self._layout.cards_per_page
+
+    @property
+    def dedup_count(self):
+        """Number of identical image objects swapped for a drawn image.
+
+        Redrawing the same image object (e.g. a back side image, or the
+        images of a reused 2-sided page) is not counted, as the PDF writer
+        embeds an image object only once anyway.
+
+        """
+        return self._dedup_count
+
+    @property
+    def dedup_bytes_saved(self):
+        """Uncompressed pixel bytes of images counted by :attr:`dedup_count`.
+
+        This is the size of raw pixel data, not of the (compressed) image
+        data which would have been embedded in the PDF.
+
+        """
+        return self._dedup_bytes
+
+    @property
+    def card_count(self):
+        """Number of cards drawn with :meth:`drawCard`."""
+        return self._card_count
+
+    @property
+    def encoding_count(self):
+        """Number of embedded images per encoding ('jpeg' and 'lossless')."""
+        return dict(self._encoding_count)
+
+    @property
+    def native_count(self):
+        """Number of embedded images with lower resolution than the PDF."""
+        return self._native_count
+
+    @property
+    def native_pixels_saved(self):
+        """Number of pixels not embedded, due to lower resolution images.
+
+        This is the difference between the number of pixels of embedded
+        images at PDF resolution, and the number of pixels of the embedded
+        images (see :meth:`setNativeResolution`).
+
+        """
+        return self._native_pixels
 
     def abort(self, remove=True):
         """Aborts writing to PDF document.
@@ -656,11 +1842,12 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
         """Finishes the PDF document, ending the painter."""
         if self._done:
             raise LcgException('Cannot close or abort more than once')
-        if not self._folded:
-            self._flush_card_cache()
-        if self._painter:
-            self._painter.end()
-            self._painter = None
+        with _span('finish'):
+            if not self._folded:
+                self._flush_card_cache()
+            if self._painter:
+                self._painter.end()
+                self._painter = None
         self._done = True
 
     def mm_to_px(self, offset_mm):
@@ -678,6 +1865,8 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
         if self._painter is None:
             self._painter = QtGui.QPainter(self)
             self._painter.setRenderHint(QtGui.QPainter.Antialiasing, True)
+            if self._encoding == 'lossless':
+                self._painter.setRenderHint(_LOSSLESS, True)
         return self._painter
 
     def setTwosidedSubset(self, odd, even):
@@ -686,6 +1875,11 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
         :param  odd: if True include odd numbered (card front) pages
         :param even: if True include even numbered (card back) pages
 
+        Excluded pages are not drawn, and card sides on those pages are
+        not resolved (see :meth:`drawCard`). Page numbering is not affected,
+        e.g. the offset set with :meth:`setTwosidedEvenPageOffset` is
+        applied to back side pages also if front side pages are excluded.
+
         Method must be called before a painter is initiated on PDF generator.
 
         """
@@ -694,6 +1888,16 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
         self._odd = odd
         self._even = even
 
+    @property
+    def draws_fronts(self):
+        """True if card fronts are drawn (see :meth:`setTwosidedSubset`)."""
+        return self._folded or self._odd
+
+    @property
+    def draws_backs(self):
+        """True if card backs are drawn (see :meth:`setTwosidedSubset`)."""
+        return self._folded or self._even
+
     def setTwosidedEvenPageOffset(self, offset_x, offset_y):
         """Set offset for even numbered pages with 2-sided printing.
 
@@ -708,6 +1912,77 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
         self._ex_offset = offset_x
         self._ey_offset = offset_y
 
+    def setBleedMethod(self, method):
+        """Sets the method used by :meth:`loadCard` for adding bleed.
+
+        :param method: bleed method (see :meth:`LcgImage.addBleed`)
+        :type  method: str
+
+        """
+        if method not in ('simple', 'numpy', 'mirror', 'reflect'):
+            raise ValueError(f'Method {method} not supported')
+        self._bleed_method = method
+
+    def setResampleQuality(self, quality):
+        """Sets the quality used by :meth:`loadCard` for scaling images.
+
+        :param quality: resampling quality (see :meth:`LcgImage.resampled`)
+        :type  quality: str
+
+        """
+        if quality not in ('fast', 'balanced', 'best'):
+            raise ValueError(f'Resample quality {quality} not supported')
+        self._resample = quality
+
+    def setNativeResolution(self, native):
+        """Sets whether :meth:`loadCard` keeps the resolution of images.
+
+        :param native: if True keep the resolution of images which have the
+                       same or lower resolution than the PDF document
+        :type  native: bool
+
+        With native resolution, bleed is adjusted without scaling the image,
+        and the image is scaled by the painter when it is drawn. The PDF
+        embeds the image pixels rather than the image upscaled to the PDF
+        resolution, which gives smaller documents that render faster. Images
+        with a higher resolution are scaled down as usual. See
+        :attr:`native_pixels_saved`.
+
+        """
+        self._native = bool(native)
+
+    def setImageEncoding(self, encoding):
+        """Sets how card images are compressed when embedded in the PDF.
+
+        :param encoding: 'jpeg', 'lossless' or 'auto'
+        :type  encoding: str
+
+        With 'jpeg' (the default) images are embedded with JPEG compression
+        (with the fixed quality of the Qt PDF writer), and with 'lossless'
+        they are compressed with deflate, which is larger for photographic
+        images but does not add compression artifacts. With 'auto' each
+        image is embedded with the encoding which is estimated to be the
+        smaller for that image, preferring lossless. See
+        :attr:`encoding_count`.
+
+        Method must be called before a painter is initiated on PDF generator.
+
+        """
+        if self._painter or self._done:
+            raise LcgException('Cannot set encoding after painting initiated')
+        if encoding not in ('jpeg', 'lossless', 'auto'):
+            raise ValueError(f'Image encoding {encoding} not supported')
+        self._encoding = encoding
+
+    def setImageCache(self, cache):
+        """Sets a cache of processed card images used by :meth:`loadCard`.
+
+        :param cache: image cache (or None to disable caching)
+        :type  cache: :class:`LcgImageCache`
+
+        """
+        self._image_cache = cache
+
     def setFeedDir(self, feed_dir):
         """Specify feed direction for 2-sided printing.
 
@@ -727,22 +2002,30 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
     @property
     def cards_per_row(self):
         """Max number of cards fitted per row of PDF document."""
-        return self._cards_per_row
+        return self._layout.cards_per_row
+
+    @property
+    def layout(self):
+        """Layout of cards on pages (:class:`LcgPageLayout`)."""
+        return self._layout
 
     def _flush_card_cache(self):
         """Draws the cards in the card cache (for 2-sided printing)."""
-        fronts, backs = zip(*(self._card_cache))
-        fronts, backs = list(fronts), list(backs)
-        fronts += [None]*(self._cards_per_page - len(self._card_cache))
-        backs += [None]*(self._cards_per_page - len(self._card_cache))
+        if not self._card_cache:
+            return
+        fronts = [(f, f_rot) for f, _, f_rot, _ in self._card_cache]
+        backs = [(b, b_rot) for _, b, _, b_rot in self._card_cache]
+        per_page, per_row = self._layout.cards_per_page, self.cards_per_row
+        fronts += [(None, 0)]*(per_page - len(self._card_cache))
+        backs += [(None, 0)]*(per_page - len(self._card_cache))
 
         front_rows, back_rows = [], []
         while fronts:
-            front_rows.append(fronts[:self._cards_per_row])
-            fronts = fronts[self._cards_per_row:]
+            front_rows.append(fronts[:per_row])
+            fronts = fronts[per_row:]
         while backs:
-            back_rows.append(backs[:self._cards_per_row])
-            backs = backs[self._cards_per_row:]
+            back_rows.append(backs[:per_row])
+            backs = backs[per_row:]
 
         if self._feed_dir == 'landscape':
             for b_l in back_rows:
@@ -753,16 +2036,633 @@ class LcgCardPdfGenerator(QtGui.QPdfWriter):
             _rotate = (self._c_width < self._c_height)
         else:
             raise NotImplementedError('Should never happen')
-        if _rotate:
-            for b_l in back_rows:
-                for i, b in enumerate(b_l):
-                    if b:
-                        b_l[i] = b.rotateHalfCircle()
 
-        # Draw all the cards
-        for row_l in front_rows, back_rows:
-            for row in row_l:
-                for card_side in row:
-                    self._draw_card_two_sided(card_side)
+        # Draw front side page
+        if self._odd:
+            for row in front_rows:
+                for card_side, rotation in row:
+                    self._draw_card_two_sided(card_side, rotation)
+        else:
+            self._skip_page()
+
+        # Back sides are turned upside down by the painter if needed
+        if _rotate:
+            back_rows = [[(b, (b_rot + 180) % 360) for b, b_rot in row]
+                         for row in back_rows]
+
+        # Draw back side page. If it is identical to the previous back side
+        # page, then the previous page's recorded painter calls are replayed
+        signature = (self._current_page % 2,
+                     tuple((self._side_key(b), b_rot) for row in back_rows
+                           for b, b_rot in row))
+        if not self._even:
+            self._skip_page()
+        elif self._back_page and self._back_page[0] == signature:
+            self._stamp_page(self._back_page[1])
+        else:
+            self._page_ops = []
+            try:
+                for row in back_rows:
+                    for card_side, rotation in row:
+                        self._draw_card_two_sided(card_side, rotation)
+                self._back_page = (signature, self._page_ops)
+            finally:
+                self._page_ops = None
 
         self._card_cache = []
+
+    def _skip_page(self):
+        """Skips a page (for 2-sided printing) without drawing it.
+
+        The page number is incremented, so that the next page drawn has the
+        page number following the skipped page. A PDF page is only added
+        when the next page is drawn, and only if a page has been drawn.
+
+        """
+        self._current_page += 1
+
+    def _side_key(self, card_side):
+        """Returns a key identifying the content of a card side."""
+        if isinstance(card_side, QtGui.QImage):
+            return ('image', card_side.cacheKey())
+        elif isinstance(card_side, QtGui.QColor):
+            return ('color', card_side.rgba())
+        return card_side
+
+
+class LcgCardLoader(object):
+    """Loads cards for a PDF generator with a pool of workers.
+
+    :param generator: PDF generator to load and draw cards for
+    :type  generator: :class:`LcgCardPdfGenerator`
+    :param      jobs: number of workers (if 1, load in calling thread)
+    :param lookahead: max number of queued cards (if None, 2*jobs)
+    :param processes: if True use worker processes instead of threads
+
+    Card images are loaded with :meth:`LcgCardPdfGenerator.loadCard` by
+    workers, whereas cards are only drawn onto the PDF by the thread which
+    calls :meth:`drawCard` or :meth:`finish`. Queued cards are kept in a
+    reorder buffer and drawn in the order they were queued, so that the
+    generated PDF is identical to loading and drawing cards serially.
+
+    With worker processes, image files are decoded and processed in another
+    process, which writes the resulting pixels to a shared memory block
+    allocated by the loader. The loaded :class:`LcgImage` wraps the shared
+    memory without copying, and the memory is released when the image is
+    garbage collected. Images (rather than file names) passed to :meth:`load`
+    are processed in the calling process.
+
+    """
+
+    def __init__(self, generator, jobs=1, lookahead=None, processes=False):
+        if jobs < 1:
+            raise LcgException('Number of jobs must be at least 1')
+        self._generator = generator
+        self._jobs = jobs
+        if lookahead is None:
+            lookahead = 2*jobs
+        self._lookahead = max(lookahead, 0)
+        self._processes = processes and jobs > 1
+        if self._processes:
+            # Worker processes are spawned rather than forked, as forking a
+            # process with Qt objects and threads is not safe
+            context = multiprocessing.get_context('spawn')
+            self._executor = ProcessPoolExecutor(max_workers=jobs,
+                                                 mp_context=context)
+        elif jobs > 1:
+            self._executor = ThreadPoolExecutor(max_workers=jobs)
+        else:
+            self._executor = None
+        self._queue = deque()
+
+    def load(self, image, trans=None, bleed=0, adjust=True,
+             defer_rotation=False):
+        """Schedules loading a card image.
+
+        :return: future result of :meth:`LcgCardPdfGenerator.loadCard`
+        :rtype:  :class:`concurrent.futures.Future`
+
+        Arguments are the same as for :meth:`LcgCardPdfGenerator.loadCard`.
+        If the loader has a single job, the image is loaded immediately.
+
+        """
+        generator = self._generator
+        if self._processes and not isinstance(image, QtGui.QImage):
+            return self._load_shared(image, trans=trans, bleed=bleed,
+                                     adjust=adjust,
+                                     defer_rotation=defer_rotation)
+        elif self._executor:
+            return self._executor.submit(generator.loadCard, image,
+                                         trans=trans, bleed=bleed,
+                                         adjust=adjust,
+                                         defer_rotation=defer_rotation)
+        future = Future()
+        try:
+            result = generator.loadCard(image, trans=trans, bleed=bleed,
+                                        adjust=adjust,
+                                        defer_rotation=defer_rotation)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        return future
+
+    def drawCard(self, front=None, back=None, front_rotation=0,
+                 back_rotation=0):
+        """Queues a card for drawing onto the PDF.
+
+        :param front: front side (as for :meth:`LcgCardPdfGenerator.drawCard`)
+        :type  front: :class:`PySide6.QtGui.QImage`,
+                      :class:`PySide6.QtGui.QColor` or
+                      :class:`concurrent.futures.Future`
+        :param  back: back side (as for :meth:`LcgCardPdfGenerator.drawCard`)
+        :type   back: :class:`PySide6.QtGui.QImage`,
+                      :class:`PySide6.QtGui.QColor` or
+                      :class:`concurrent.futures.Future`
+
+        If a card side is a future (as returned by :meth:`load`), drawing the
+        card waits for its result. Queued cards are drawn when the queue
+        exceeds the lookahead size. Rotations are passed on to
+        :meth:`LcgCardPdfGenerator.drawCard`.
+
+        A card side may also be a lazy card reference (see
+        :meth:`LcgCardPdfGenerator.drawCard`), which may return a future.
+        The reference is called when the card is queued, so that the image
+        can be loaded by a worker, but only if the generator draws that side
+        (see :attr:`LcgCardPdfGenerator.draws_backs`). Otherwise the side is
+        never loaded.
+
+        """
+        generator = self._generator
+        front = generator._resolve_side(front, generator.draws_fronts)
+        back = generator._resolve_side(back, generator.draws_backs)
+        self._queue.append((front, back, front_rotation, back_rotation))
+        while len(self._queue) > self._lookahead:
+            self._draw_next()
+
+    def finish(self):
+        """Draws all queued cards and shuts down worker threads.
+
+        The method does not finish the PDF generator.
+
+        """
+        while self._queue:
+            self._draw_next()
+        if self._executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    def abort(self):
+        """Discards all queued cards and shuts down worker threads."""
+        for front, back, _, _ in self._queue:
+            for card_side in front, back:
+                if isinstance(card_side, Future):
+                    card_side.cancel()
+        self._queue.clear()
+        if self._executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    @property
+    def jobs(self):
+        """Number of workers used for loading cards."""
+        return self._jobs
+
+    @property
+    def processes(self):
+        """True if cards are loaded by worker processes."""
+        return self._processes
+
+    def _load_shared(self, image, trans, bleed, adjust, defer_rotation):
+        """Schedules loading a card image in a worker process."""
+        gen = self._generator
+        w_px = gen.mm_to_px(gen._c_width + 2*gen._bleed)
+        h_px = gen.mm_to_px(gen._c_height + 2*gen._bleed)
+        shm = shared_memory.SharedMemory(create=True, size=4*w_px*h_px)
+        try:
+            proc_future = self._executor.submit(_load_card_shared,
+                                                gen._card_params(), shm.name,
+                                                image, trans=trans,
+                                                bleed=bleed, adjust=adjust,
+                                                defer_rotation=defer_rotation,
+                                                cache=gen._image_cache)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+
+        # The returned future is running and cannot be cancelled, so that
+        # the shared memory is always released by _resolve()
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        def _resolve(proc_future):
+            # The name of the block is no longer needed once the worker
+            # process is done; its memory remains valid until closed
+            shm.unlink()
+            try:
+                img = LcgImage._fromSharedMemory(shm, *proc_future.result())
+            except Exception as e:
+                shm.close()
+                future.set_exception(e)
+            else:
+                future.set_result(img)
+        proc_future.add_done_callback(_resolve)
+        return future
+
+    def _draw_next(self):
+        """Draws the first card in the queue."""
+        front, back, front_rotation, back_rotation = self._queue.popleft()
+        with _span('wait'):
+            if isinstance(front, Future):
+                front = front.result()
+            if isinstance(back, Future):
+                back = back.result()
+        self._generator.drawCard(front, back, front_rotation=front_rotation,
+                                 back_rotation=back_rotation)
+
+
+class LcgImageCache(object):
+    """Persistent on-disk cache of processed card images.
+
+    :param     path: directory for cache files (created when needed)
+    :type      path: str
+    :param max_size: max total size of cache files in bytes (or None)
+
+    Cache entries are keyed on the source image file (its path, size and
+    modification time) and all parameters which affect the processed image,
+    see :meth:`key`. Images are stored as raw pixel data, so a cached image
+    can be loaded without decoding or otherwise processing pixels.
+
+    When the total size of cache files exceeds *max_size*, the least recently
+    used entries are removed. The size limit is checked by each cache object
+    separately, so it may be temporarily exceeded if several processes write
+    to the same cache. A cache object may be shared by threads, which update
+    its tracked size and prune entries under a lock.
+
+    """
+
+    _HEADER = struct.Struct('<8s7q')
+    _MAGIC = b'LCGIMG02'
+    _SUFFIX = '.lcgimg'
+
+    def __init__(self, path, max_size=None):
+        self._path = path
+        self._max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled, a cache passed to a worker process gets
+        # a lock of its own
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def key(self, filename, *params):
+        """Returns the cache key for an image file processed with params.
+
+        :param filename: source image file name
+        :type  filename: str
+        :param   params: parameters which affect the processed image
+        :return:         key (or None if file does not exist)
+        :rtype:          str
+
+        Parameters must have a deterministic :func:`repr`.
+
+        """
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        source = (os.path.realpath(filename), st.st_size, st.st_mtime_ns)
+        return hashlib.sha256(repr((source, params)).encode()).hexdigest()
+
+    def get(self, key):
+        """Returns cached image for the key.
+
+        :param key: cache key (as generated by :meth:`key`)
+        :return:    cached image (or None if not in cache)
+        :rtype:     :class:`LcgImage`
+
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(self._HEADER.size)
+                (magic, w, h, fmt, bpl, dpm_x, dpm_y,
+                 rotation) = self._HEADER.unpack(header)
+                if magic != self._MAGIC:
+                    return None
+                data = bytearray(bpl*h)
+                if f.readinto(data) != len(data):
+                    return None
+            # Mark entry as recently used
+            os.utime(path)
+        except (OSError, struct.error):
+            return None
+        img = LcgImage(data, w, h, bpl, QtGui.QImage.Format(fmt))
+        img.setDotsPerMeterX(dpm_x)
+        img.setDotsPerMeterY(dpm_y)
+        img.setRotation(rotation)
+        img._buffer = data
+        return img
+
+    def put(self, key, image):
+        """Adds an image to the cache.
+
+        :param   key: cache key (as generated by :meth:`key`)
+        :param image: image to add
+        :type  image: :class:`PySide6.QtGui.QImage`
+
+        """
+        rotation = image.rotation() if isinstance(image, LcgImage) else 0
+        if image.colorCount() > 0:
+            # Color tables are not stored, convert to a format without one
+            image = LcgImage(image)
+            image = image.convertToFormat(image._paint_format())
+        header = self._HEADER.pack(self._MAGIC, image.width(),
+                                   image.height(), image.format().value,
+                                   image.bytesPerLine(),
+                                   image.dotsPerMeterX(),
+                                   image.dotsPerMeterY(), rotation)
+        os.makedirs(self._path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self._path)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(image.constBits())
+            os.replace(tmp_path, self._entry_path(key))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        if self._max_size is not None:
+            with self._lock:
+                if self._size is None:
+                    self._size = self.stats()[1]
+                else:
+                    self._size += len(header) + image.sizeInBytes()
+                if self._size > self._max_size:
+                    self._prune(self._max_size)
+
+    def entries(self):
+        """Returns a list of (path, size, last_used) for all cache entries."""
+        result = []
+        try:
+            with os.scandir(self._path) as it:
+                for entry in it:
+                    if entry.name.endswith(self._SUFFIX):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        result.append((entry.path, st.st_size, st.st_mtime))
+        except FileNotFoundError:
+            pass
+        return result
+
+    def stats(self):
+        """Returns tuple (number of entries, total size in bytes)."""
+        entries = self.entries()
+        return len(entries), sum(size for path, size, used in entries)
+
+    def prune(self, max_size=None):
+        """Removes least recently used entries until cache fits max size.
+
+        :param max_size: max size in bytes (if None use the cache's max size)
+        :return:         tuple (number of removed entries, bytes removed)
+
+        """
+        if max_size is None:
+            max_size = self._max_size
+        if max_size is None:
+            return 0, 0
+        with self._lock:
+            return self._prune(max_size)
+
+    def _prune(self, max_size):
+        """Prunes cache to a max size, see :meth:`prune` (holding lock)."""
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for path, size, used in entries)
+        num_removed, bytes_removed = 0, 0
+        for path, size, used in entries:
+            if total <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            num_removed += 1
+            bytes_removed += size
+        self._size = total
+        return num_removed, bytes_removed
+
+    def clear(self):
+        """Removes all cache entries.
+
+        :return: tuple (number of removed entries, bytes removed)
+
+        """
+        return self.prune(max_size=0)
+
+    @property
+    def path(self):
+        """Directory of cache files."""
+        return self._path
+
+    @property
+    def max_size(self):
+        """Max total size of cache files in bytes (or None)."""
+        return self._max_size
+
+    def _entry_path(self, key):
+        """Returns path to cache file for the key."""
+        return os.path.join(self._path, key + self._SUFFIX)
+
+
+class LcgTracer(object):
+    """Records timings and memory use of card processing stages.
+
+    While a tracer is activated with :meth:`activate`, card processing by
+    :class:`LcgCardPdfGenerator` and :class:`LcgCardLoader` records a span
+    for each processing stage:
+
+    * ``cache``: loading a card image from an :class:`LcgImageCache`
+    * ``cache_put``: adding a processed card image to the cache
+    * ``decode``: reading and decoding an image file
+    * ``transform``: applying an image transform (e.g. rotation)
+    * ``bleed``: adding or cropping bleed
+    * ``scale``: scaling the image to the target resolution
+    * ``wait``: :class:`LcgCardLoader` waiting for a card to be loaded
+    * ``draw``: drawing a card onto the PDF (in 2-sided mode cards are
+      drawn when a page is complete)
+    * ``finish``: finishing the PDF (which writes the PDF file)
+
+    Each span records the change in the process' resident memory (RSS) while
+    the stage was active, if available for the platform. Stages performed in
+    worker processes of an :class:`LcgCardLoader` are not recorded.
+
+    Recording is thread safe. When no tracer is active, processing stages are
+    not timed.
+
+    """
+
+    _active = None
+
+    def __init__(self):
+        self._events = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._pid = os.getpid()
+
+    def activate(self):
+        """Sets this tracer as the active tracer (replacing any other)."""
+        LcgTracer._active = self
+
+    @classmethod
+    def deactivate(cls):
+        """Deactivates the active tracer (if any)."""
+        cls._active = None
+
+    @classmethod
+    def active(cls):
+        """Returns the active tracer (or None)."""
+        return cls._active
+
+    @contextlib.contextmanager
+    def span(self, stage, card=None):
+        """Context manager which records a span for a processing stage.
+
+        :param stage: name of the stage
+        :type  stage: str
+        :param  card: identifier of processed card (or None)
+
+        """
+        rss = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            rss_end = _rss_bytes()
+            rss_delta = None if rss is None else rss_end - rss
+            event = (stage, card, start, end, threading.get_ident(),
+                     rss_delta, rss_end)
+            with self._lock:
+                self._events.append(event)
+
+    def summary(self):
+        """Returns aggregated statistics for each stage.
+
+        :return: list of tuples (stage, count, total_sec, mean_sec, max_sec,
+                 rss_delta_bytes), in order of first recorded span
+        :rtype:  list(tuple)
+
+        The RSS delta is None if memory use is not available.
+
+        """
+        stats = OrderedDict()
+        with self._lock:
+            events = list(self._events)
+        for stage, card, start, end, tid, rss_delta, rss in events:
+            count, total, max_sec, rss_sum = stats.get(stage, (0, 0, 0, None))
+            if rss_delta is not None:
+                rss_sum = (rss_sum or 0) + rss_delta
+            stats[stage] = (count + 1, total + end - start,
+                            max(max_sec, end - start), rss_sum)
+        return [(stage, count, total, total/count, max_sec, rss_sum)
+                for stage, (count, total, max_sec, rss_sum) in stats.items()]
+
+    def summaryTable(self):
+        """Returns :meth:`summary` formatted as a text table."""
+        lines = [f'{"stage":10} {"count":>6} {"total ms":>10} '
+                 f'{"mean ms":>9} {"max ms":>9} {"rss MB":>8}']
+        for stage, count, total, mean, max_sec, rss in self.summary():
+            _rss = '' if rss is None else f'{rss/1024**2:8.1f}'
+            lines.append(f'{stage:10} {count:6d} {total*1000:10.1f} '
+                         f'{mean*1000:9.2f} {max_sec*1000:9.2f} {_rss:>8}')
+        return '\n'.join(lines)
+
+    def writeChromeTrace(self, filename):
+        """Writes recorded spans as a Chrome trace event JSON file.
+
+        :param filename: name of file to write
+        :type  filename: str
+
+        The file can be loaded by trace viewers such as ``chrome://tracing``
+        or `Perfetto <https://ui.perfetto.dev/>`__.
+
+        """
+        with self._lock:
+            events = list(self._events)
+        trace = []
+        for stage, card, start, end, tid, rss_delta, rss in events:
+            args = dict()
+            if card is not None:
+                args['card'] = card
+            if rss_delta is not None:
+                args['rss_delta_mb'] = rss_delta/1024**2
+            ts = (start - self._t0)*1e6
+            trace.append(dict(name=stage, cat='lcgtools', ph='X', ts=ts,
+                              dur=(end - start)*1e6, pid=self._pid, tid=tid,
+                              args=args))
+            if rss is not None:
+                trace.append(dict(name='rss', ph='C', ts=(end - self._t0)*1e6,
+                                  pid=self._pid,
+                                  args=dict(rss_mb=rss/1024**2)))
+        with open(filename, 'w') as f:
+            json.dump(dict(traceEvents=trace, displayTimeUnit='ms'), f)
+
+
+def _span(stage, card=None):
+    """Returns span context manager of the active :class:`LcgTracer`."""
+    tracer = LcgTracer._active
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.span(stage, card)
+
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+def _rss_bytes():
+    """Returns resident memory of the process in bytes (or None)."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1])*_PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def _load_card_shared(params, shm_name, image, trans=None, bleed=0,
+                      adjust=True, defer_rotation=False, cache=None):
+    """Loads a card in a worker process of a :class:`LcgCardLoader`.
+
+    :param   params: card parameters of the PDF generator
+    :param shm_name: name of shared memory block to write loaded image to
+    :param    cache: image cache of the PDF generator (or None)
+    :return:         args for :meth:`LcgImage._fromSharedMemory`
+    :rtype:          tuple
+
+    """
+    img = LcgCardPdfGenerator._load_card(params, image, trans=trans,
+                                         bleed=bleed, adjust=adjust,
+                                         defer_rotation=defer_rotation,
+                                         cache=cache)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return img._toSharedMemory(shm)
+    finally:
+        shm.close()
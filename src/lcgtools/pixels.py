@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Vectorized pixel operations on image buffers.
+
+The module requires `numpy <https://numpy.org/>`__, which is an optional
+dependency of lcgtools (install as ``pip install lcgtools[numpy]``).
+
+Functions operate on 32-bit :class:`PySide6.QtGui.QImage` buffers, viewing
+each pixel as a single ``uint32`` array element. They do not use a
+:class:`PySide6.QtGui.QPainter`, and may be called from any thread.
+
+"""
+
+import math
+
+import numpy
+from PySide6 import QtGui
+
+__all__ = ['image_array', 'pad', 'pad_scaled', 'resample']
+
+_PAD_MODES = ('edge', 'symmetric', 'reflect')
+
+# Number of output rows resampled per matrix product
+_BLOCK_ROWS = 32
+
+
+def _lanczos3(x):
+    return numpy.where(numpy.abs(x) < 3, numpy.sinc(x)*numpy.sinc(x/3), 0)
+
+
+def image_array(image, writable=False):
+    """Returns a 2D array view of the pixels of a 32-bit image.
+
+    :param    image: image in a 32 bits per pixel format
+    :type     image: :class:`PySide6.QtGui.QImage`
+    :param writable: if True return writable view (detaches shared data)
+    :return:         array of shape (height, width), dtype uint32
+    :rtype:          :class:`numpy.ndarray`
+
+    The returned array does not hold a reference to *image*, which must be
+    kept alive for as long as the array is in use.
+
+    """
+    if image.depth() != 32:
+        raise ValueError('Image must have 32 bits per pixel')
+    buf = image.bits() if writable else image.constBits()
+    arr = numpy.frombuffer(buf, dtype=numpy.uint32)
+    arr = arr.reshape(image.height(), image.bytesPerLine()//4)
+    return arr[:, :image.width()]
+
+
+def pad(image, top, bottom, left, right, mode='edge'):
+    """Returns a copy of a 32-bit image padded on each side.
+
+    :param image: image in a 32 bits per pixel format
+    :type  image: :class:`PySide6.QtGui.QImage`
+    :param   top: pixels to add above the image
+    :param  mode: 'edge', 'symmetric' or 'reflect' (as :func:`numpy.pad`)
+    :return:      padded image with the same format as *image*
+    :rtype:       :class:`PySide6.QtGui.QImage`
+
+    The other side arguments are defined similarly to *top*. Source pixels
+    are copied once into the new image, and each padded border is filled
+    with a single (broadcast or fancy-indexed) array assignment.
+
+    """
+    if mode not in _PAD_MODES:
+        raise ValueError(f'Unsupported pad mode {mode}')
+    if min(top, bottom, left, right) < 0:
+        raise ValueError('Padding must be non-negative')
+    h, w = image.height(), image.width()
+    result = QtGui.QImage(w + left + right, h + top + bottom, image.format())
+    src = image_array(image)
+    dst = image_array(result, writable=True)
+
+    dst[top:top+h, left:left+w] = src
+    if mode == 'edge':
+        # Broadcast edge columns, then replicate completed edge rows
+        dst[top:top+h, :left] = src[:, :1]
+        dst[top:top+h, left+w:] = src[:, -1:]
+        dst[:top, :] = dst[top, :]
+        dst[top+h:, :] = dst[top+h-1, :]
+        return result
+
+    # Map each destination row and column to its source row/column
+    rows = numpy.pad(numpy.arange(h), (top, bottom), mode=mode)
+    cols = numpy.pad(numpy.arange(w), (left, right), mode=mode)
+    if top:
+        dst[:top, :] = src[numpy.ix_(rows[:top], cols)]
+    if bottom:
+        dst[top+h:, :] = src[numpy.ix_(rows[top+h:], cols)]
+    if left:
+        dst[top:top+h, :left] = src[:, cols[:left]]
+    if right:
+        dst[top:top+h, left+w:] = src[:, cols[left+w:]]
+    return result
+
+
+def pad_scaled(image, width, height, top, bottom, left, right, mode='edge'):
+    """Returns a 32-bit image padded as by :func:`pad` and then scaled.
+
+    :param  image: image in a 32 bits per pixel format
+    :type   image: :class:`PySide6.QtGui.QImage`
+    :param  width: width of returned image
+    :param height: height of returned image
+    :param    top: pixels to add above the image (before scaling)
+    :param   mode: 'edge', 'symmetric' or 'reflect' (as :func:`numpy.pad`)
+    :return:       padded and scaled image with the same format as *image*
+    :rtype:        :class:`PySide6.QtGui.QImage`
+
+    The result is identical to scaling the padded image with
+    :meth:`PySide6.QtGui.QImage.scaled` (fast transformation), however the
+    padded image is never created. The source row and column picked by Qt
+    for each destination pixel is mapped into the unpadded image, and each
+    destination pixel is then copied directly from the source.
+
+    """
+    if mode not in _PAD_MODES:
+        raise ValueError(f'Unsupported pad mode {mode}')
+    if min(top, bottom, left, right) < 0:
+        raise ValueError('Padding must be non-negative')
+    h, w = image.height(), image.width()
+    rows = numpy.pad(numpy.arange(h), (top, bottom), mode=mode)
+    rows = rows[_nearest(h + top + bottom, height)]
+    cols = numpy.pad(numpy.arange(w), (left, right), mode=mode)
+    cols = cols[_nearest(w + left + right, width)]
+
+    result = QtGui.QImage(width, height, image.format())
+    src = image_array(image)
+    dst = image_array(result, writable=True)
+    # Pick along the axis which reduces the intermediate array the most
+    if height*w <= h*width:
+        numpy.take(numpy.take(src, rows, axis=0), cols, axis=1, out=dst)
+    else:
+        numpy.take(numpy.take(src, cols, axis=1), rows, axis=0, out=dst)
+    return result
+
+
+def _nearest(size, new_size):
+    """Returns source indices sampled by Qt when scaling along an axis.
+
+    :param     size: number of source pixels
+    :param new_size: number of destination pixels
+    :return:         index array of length *new_size*
+
+    Indices are read back from a scaled single row image which holds the
+    index of each pixel as its value, so they match the fast transformation
+    of :meth:`PySide6.QtGui.QImage.scaled` exactly.
+
+    """
+    probe = numpy.arange(size, dtype=numpy.uint32) | numpy.uint32(0xff000000)
+    img = QtGui.QImage(probe.data, size, 1, 4*size, QtGui.QImage.Format_RGB32)
+    scaled = img.scaled(new_size, 1)
+    return image_array(scaled)[0] & 0xffffff
+
+
+def resample(image, width, height):
+    """Returns a 32-bit image resampled to a new size.
+
+    :param  image: image in format Format_RGB32 or Format_ARGB32_Premultiplied
+    :type   image: :class:`PySide6.QtGui.QImage`
+    :param  width: width of returned image
+    :param height: height of returned image
+    :return:       resampled image with the same format as *image*
+    :rtype:        :class:`PySide6.QtGui.QImage`
+
+    When downscaling by a factor of 4 or more, the image is first reduced by
+    an integer factor (up to 16) by averaging blocks of pixels, leaving a
+    remaining scale factor of at least 2. It is then resampled with a separable
+    3-lobed Lanczos filter, which is widened by the remaining scale factor
+    so that the result is anti-aliased.
+
+    """
+    fmt = image.format()
+    if fmt not in (QtGui.QImage.Format_RGB32,
+                   QtGui.QImage.Format_ARGB32_Premultiplied):
+        raise ValueError('Image must be RGB32 or ARGB32_Premultiplied')
+    h, w = image.height(), image.width()
+    f_y = min(max(1, int(h/height/2)), 16)
+    f_x = min(max(1, int(w/width/2)), 16)
+    arr = _box_reduce(image_array(image), f_y, f_x)
+
+    # Resample vertically, then horizontally (rows of a transposed result,
+    # for contiguous access), mapping destination pixel centers to source
+    # coordinates
+    arr = _filter_rows(arr, h/f_y, height, _lanczos3, 3)
+    arr = _filter_rows(arr, w/f_x, width, _lanczos3, 3)
+    numpy.rint(arr, out=arr)
+    numpy.clip(arr, 0, 255, out=arr)
+    if fmt == QtGui.QImage.Format_ARGB32_Premultiplied:
+        # Filter overshoot must not make color exceed (premultiplied) alpha
+        numpy.minimum(arr[..., :3], arr[..., 3:], out=arr[..., :3])
+    else:
+        arr[..., 3] = 255
+
+    result = QtGui.QImage(width, height, fmt)
+    dst = image_array(result, writable=True).view(numpy.uint8)
+    dst = dst.reshape(height, width, 4)
+    dst[:] = arr
+    return result
+
+
+def _box_reduce(arr, f_y, f_x):
+    """Returns a 32-bit pixel array reduced by averaging blocks of pixels.
+
+    :param arr: array of shape (h, w), dtype uint32
+    :return:    array of shape (h//f_y, w//f_x, 4), dtype float32, with the
+                bytes of each pixel (in memory order) as channels
+
+    Remaining rows and columns are dropped. Channel sums are computed with
+    two 16-bit lanes per 32-bit integer, which holds sums of up to 257 pixels.
+
+    """
+    if f_y*f_x > 257:
+        raise ValueError('Reduction factor too large')
+    h, w = arr.shape
+    if f_y == f_x == 1:
+        return arr.view(numpy.uint8).reshape(h, w, 4).astype(numpy.float32)
+    arr = arr[:h - h % f_y, :w - w % f_x]
+    lanes = []
+    for shift in (0, 8):
+        rows = None
+        for i in range(f_y):
+            part = (arr[i::f_y] >> shift) & 0x00ff00ff
+            if rows is None:
+                rows = part
+            else:
+                rows += part
+        lane = rows[:, 0::f_x].copy()
+        for i in range(1, f_x):
+            lane += rows[:, i::f_x]
+        lanes.append(lane)
+    even, odd = lanes
+    result = numpy.empty(even.shape + (4,), numpy.float32)
+    result[..., 0] = even & 0xffff
+    result[..., 1] = odd & 0xffff
+    result[..., 2] = even >> 16
+    result[..., 3] = odd >> 16
+    result *= 1/(f_y*f_x)
+    return result
+
+
+def _filter_rows(arr, src_size, dst_size, kernel, support):
+    """Resamples a float32 pixel array along its first axis.
+
+    :param      arr: array of shape (rows, columns, channels)
+    :param src_size: size of the rows in source coordinates (which may
+                     exceed the number of rows if remaining pixels were
+                     dropped by :func:`_box_reduce`)
+    :param dst_size: number of rows in the result
+    :return:         contiguous array of shape (columns, dst_size, channels)
+
+    """
+    n_rows = arr.shape[0]
+    scale = src_size/dst_size
+    f_scale = max(scale, 1.0)
+    centers = (numpy.arange(dst_size) + 0.5)*scale
+    n_taps = int(math.ceil(2*support*f_scale)) + 1
+    first = numpy.floor(centers - support*f_scale + 0.5).astype(int)
+    index = first[:, None] + numpy.arange(n_taps)
+    weights = kernel((index + 0.5 - centers[:, None])/f_scale)
+    weights /= weights.sum(axis=1, keepdims=True)
+    weights = weights.astype(numpy.float32)
+    numpy.clip(index, 0, n_rows - 1, out=index)
+
+    # Output rows are computed in blocks, each as a product of a (banded)
+    # weight matrix and the source rows it covers
+    flat = arr.reshape(n_rows, -1)
+    result = numpy.empty((dst_size, flat.shape[1]), numpy.float32)
+    for start in range(0, dst_size, _BLOCK_ROWS):
+        stop = min(start + _BLOCK_ROWS, dst_size)
+        b_index = index[start:stop]
+        first_row, end_row = b_index.min(), b_index.max() + 1
+        matrix = numpy.zeros((stop - start, end_row - first_row),
+                             numpy.float32)
+        rows = numpy.repeat(numpy.arange(stop - start), n_taps)
+        numpy.add.at(matrix, (rows, (b_index - first_row).ravel()),
+                     weights[start:stop].ravel())
+        numpy.matmul(matrix, flat[first_row:end_row],
+                     out=result[start:stop])
+    result = result.reshape((dst_size,) + arr.shape[1:])
+    return numpy.ascontiguousarray(result.transpose(1, 0, 2))
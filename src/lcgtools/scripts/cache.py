@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Shows statistics for and prunes the lcg_pdf image cache."""
+
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+import sys
+import textwrap
+
+from lcgtools import LcgException, __version__
+from lcgtools.apps.lcgpdf import get_app_properties, get_image_cache
+from lcgtools.util import Utility
+
+
+class Arguments(object):
+    """Handles command line argument parsing.
+
+    Parses sysv.args arguments and registers relevant as attributes
+    on the :class:`Arguments` object.
+
+    """
+
+    def __init__(self):
+        # Set up ArgumentParser for parsing command line arguments
+        epilog = """
+        Default argument values are shown in [brackets]. The cache holds card
+        images processed by lcg_pdf --cache. When pruning, least recently used
+        images are removed until the cache fits the max cache size.
+
+        """
+        epilog = textwrap.dedent(epilog)
+        formatter = RawDescriptionHelpFormatter
+        parser = ArgumentParser(description='Show statistics for or prune the '
+                                            'lcg_pdf image cache.',
+                                formatter_class=formatter, epilog=epilog)
+        parser.add_argument('--prune', action='store_true',
+                            help='prune cache to max cache size')
+        parser.add_argument('--clear', action='store_true',
+                            help='remove all cached images')
+        parser.add_argument('--max_size', metavar='MB', nargs=1, type=float,
+                            default=[None], help='max cache size in MB [2048]')
+        parser.add_argument('-c', '--conf', action='store_true',
+                            help='use the lcg_pdf application config file')
+        parser.add_argument('--exc', action='store_true',
+                            help='show full python exception traces')
+        parser.add_argument('--version', action='version',
+                            version=f'%(prog)s {__version__}')
+        args = parser.parse_args(sys.argv[1:])
+
+        self.prune = args.prune
+        self.clear = args.clear
+        self.max_size, = args.max_size
+        self.conf = args.conf
+        self.exc = args.exc
+
+        if self.prune and self.clear:
+            raise LcgException('Only one of --prune and --clear may be '
+                               'specified')
+        if self.max_size is not None and self.max_size < 0:
+            raise LcgException('--max_size must be non-negative')
+
+        # If --conf was specified, load config file
+        if self.conf:
+            self.conf = get_app_properties()
+            if self.max_size is None:
+                self.max_size = self.conf.get_property('image_cache_size_mb',
+                                                       default=None)
+        else:
+            self.conf = None
+
+
+# Main program
+def main():
+    args = None
+    try:
+        args = Arguments()
+        cache = get_image_cache(max_size_mb=args.max_size)
+
+        _cache_dir = Utility.path_relative_to_home(cache.path)
+        print(f'Image cache: {_cache_dir}')
+        if args.clear:
+            num, size = cache.clear()
+            print(f'- removed {num} images ({size/1024**2:.1f} MB)')
+        elif args.prune:
+            num, size = cache.prune()
+            print(f'- removed {num} images ({size/1024**2:.1f} MB)')
+        num, size = cache.stats()
+        print(f'- cached images : {num}')
+        print(f'- cache size    : {size/1024**2:.1f} MB')
+        print(f'- max size      : {cache.max_size/1024**2:.1f} MB')
+    except Exception as e:
+        sys.stderr.write(f'\nError: {e}\n\n')
+        if args and args.exc:
+            raise e
+
+
+if __name__ == '__main__':
+    main()
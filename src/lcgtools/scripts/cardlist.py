@@ -29,7 +29,9 @@ import textwrap
 
 from lcgtools import LcgException, __version__
 from lcgtools.apps.lcgpdf import get_app_properties
-from lcgtools.graphics import LcgImage
+from lcgtools.cardlist import parse_card_list, format_card_list
+from lcgtools.cardlist import LcgCardListBack, LcgCardListBleed
+from lcgtools.cardlist import LcgCardListFront
 from lcgtools.util import Utility
 
 
@@ -154,6 +156,13 @@ def main():
         args = Arguments()
         verb = lambda s: sys.stderr.write(s + '\n') if args.verbose else None
 
+        # Card lists on stdin are validated before any output is written,
+        # and are then passed on unchanged
+        if args.pass_on_stdin:
+            stdin_lines = sys.stdin.readlines()
+            for _ in parse_card_list(stdin_lines, name='stdin'):
+                pass
+
         if args.out_file is not None:
             _outfile = Utility.path_relative_to_home(args.out_file)
             if args.append:
@@ -168,10 +177,11 @@ def main():
 
         if args.pass_on_stdin and not args.first:
             verb(f'Pulling file list inputs from stdin to the output')
-            for line in sys.stdin:
-                out.write(line)
+            out.writelines(stdin_lines)
 
-        # Parse front_files arguments and resolve images in directories
+        # Parse front_files arguments and resolve images in directories (Qt
+        # is imported only when needed, for fast startup)
+        from lcgtools.graphics import LcgImageInfo
         front_files = []
         for f in args.front_files:
             if os.path.isdir(f):
@@ -179,31 +189,28 @@ def main():
                 for f2 in os.listdir(f):
                     f2 = os.path.join(f, f2)
                     if os.path.isfile(f2):
-                        if not LcgImage(f2).isNull():
+                        if LcgImageInfo(f2).isValid():
                             front_files.append(f2)
             else:
                 # For files, validate that they are an image file
-                if LcgImage(f).isNull():
+                if not LcgImageInfo(f).isValid():
                     raise LcgException(f'Not a valid image: "{f}"')
                 front_files.append(f)
 
         _back_file = Utility.path_relative_to_home(args.back_file)
         verb(f'Specifying card back side image:\n  {_back_file}')
-        out.write(f'{args.back_file}\n')
+        records = [LcgCardListBack(args.back_file, args.back_bleed, None)]
         verb(f'Setting bleed included on back: {args.back_bleed} mm')
-        out.write(f'{args.back_bleed}\n')
         verb(f'Setting bleed included on loaded cards: {args.front_bleed} mm')
-        out.write(f'{args.front_bleed}\n')
-
+        records.append(LcgCardListBleed(args.front_bleed, None))
         for f in front_files:
             verb(f'Adding image: {Utility.path_relative_to_home(f)}')
-            out.write(f'{f}\n')
-        out.write('\n')
+            records.append(LcgCardListFront(f, None))
+        out.writelines(format_card_list(records))
 
         if args.pass_on_stdin and args.first:
             verb(f'Pulling file list inputs from stdin to the output')
-            for line in sys.stdin:
-                out.write(line)
+            out.writelines(stdin_lines)
 
         if args.out_file is not None:
             out.close()
@@ -27,9 +27,7 @@ import sys
 import textwrap
 
 from lcgtools import LcgException, __version__
-from lcgtools.graphics import LcgImage
 from lcgtools.util import Utility
-from PySide6.QtWidgets import QApplication
 
 
 class Arguments(object):
@@ -46,9 +44,11 @@ class Arguments(object):
         Default argument values are shown in [brackets]. If an IMAGE argument
         is a directory, then all files that are images in that directory, are
         included. Operations are performed in the following order: rotate,
-        resize, add (or crop) bleed. Bleed is added using a simplistic method,
-        padding the outermost pixels of the input image to fill the missing
-        space. If bleed value is negative then the image is cropped. Exactly
+        resize, add (or crop) bleed. By default bleed is added using a
+        simplistic method, padding the outermost pixels of the input image to
+        fill the missing space; with --bleed_method mirror or reflect it is
+        filled with a mirror image of the pixels inside the image edge. If
+        bleed value is negative then the image is cropped. Exactly
         one of --output or --prefix must be provided. If more than one input
         image is listed, then only --prefix may be used. Only one of the
         options --to_portrait, --to_landscape or --rotate may be used.
@@ -86,6 +86,10 @@ class Arguments(object):
                             help='new (rotated) height in mm [88]')
         parser.add_argument('-b', '--bleed', metavar='MM', nargs=1, type=float,
                             default=[0], help='added bleed in mm [0]')
+        parser.add_argument('--bleed_method', nargs=1, type=str.lower,
+                            default=['simple'],
+                            choices=['simple', 'numpy', 'mirror', 'reflect'],
+                            help='method for adding bleed [simple]')
         parser.add_argument('-v', '--verbose', action='store_true',
                             help='enable verbose output to stderr')
         parser.add_argument('--version', action='version',
@@ -96,6 +100,7 @@ class Arguments(object):
         self.output, = args.output
         self.prefix, = args.prefix
         self.bleed, = args.bleed
+        self.bleed_method, = args.bleed_method
         self.resize = args.resize
         self.width, = args.width
         self.height, = args.height
@@ -117,10 +122,14 @@ class Arguments(object):
 
 # Main program
 def main():
-    # Required to make Qt application run headless
-    qapp = QApplication([sys.argv[0], '-platform', 'offscreen'])
-
     args = Arguments()
+
+    # Qt is imported only after parsing arguments, for fast startup
+    from lcgtools.graphics import LcgImage, LcgImageInfo
+    from PySide6.QtGui import QGuiApplication
+
+    # Required to make Qt application run headless
+    qapp = QGuiApplication([sys.argv[0], '-platform', 'offscreen'])
     verb = lambda msg: sys.stderr.write(msg + '\n') if args.verbose else None
 
     # Parse front_files arguments and resolve images in directories
@@ -131,11 +140,11 @@ def main():
             for f2 in os.listdir(f):
                 f2 = os.path.join(f, f2)
                 if os.path.isfile(f2):
-                    if not LcgImage(f2).isNull():
+                    if LcgImageInfo(f2).isValid():
                         inputs.append(f2)
         else:
             # For files, validate that they are an image file
-            if LcgImage(f).isNull():
+            if not LcgImageInfo(f).isValid():
                 raise LcgException(f'Not a valid image: "{f}"')
             inputs.append(f)
 
@@ -169,8 +178,8 @@ def main():
 
         # Add (or crop) bleed
         if args.bleed > 0:
-            verb(f'Adding {args.bleed} mm bleed')
-            img = img.addBleed(args.bleed)
+            verb(f'Adding {args.bleed} mm bleed ({args.bleed_method})')
+            img = img.addBleed(args.bleed, method=args.bleed_method)
         elif args.bleed < 0:
             verb(f'Cropping {-args.bleed} mm')
             img = img.cropBleed(-args.bleed)
@@ -23,16 +23,18 @@
 """Creates a printable PDF for a set of card images."""
 
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from functools import partial
 import os
 import os.path
 import sys
 import textwrap
 
 from lcgtools import LcgException, __version__
-from lcgtools.apps.lcgpdf import get_app_properties
-from lcgtools.graphics import LcgCardPdfGenerator, LcgAspectRotation, LcgImage
+from lcgtools.cardlist import parse_card_list
+from lcgtools.cardlist import LcgCardListBack, LcgCardListBleed
+from lcgtools.cardlist import LcgCardListFront
+from lcgtools.apps.lcgpdf import get_app_properties, get_image_cache
 from lcgtools.util import Utility
-from PySide6.QtWidgets import QApplication
 
 
 class Arguments(object):
@@ -48,12 +50,25 @@ class Arguments(object):
         epilog = """
         Default argument values are shown in [brackets]. If an IMAGE argument
         is a directory, then all files that are images in that directory, are
-        included. Bleed is added using a simplistic method, padding the
-        outermost pixels of the input image to fill the missing space. By
+        included. By default bleed is added using a simplistic method,
+        padding the outermost pixels of the input image to fill the missing
+        space; --bleed_method mirror or reflect instead fills it with a mirror
+        image of the pixels inside the image edge. Images are scaled to the
+        PDF resolution with --resample quality fast (default), balanced
+        (smooth, reduces aliasing) or best (sharper, slower). With
+        --native_resolution images with a resolution at or below the PDF
+        resolution are embedded without upscaling, giving smaller PDFs.
+        Images are embedded with --image_encoding jpeg (default), lossless,
+        or auto (the smaller of the two for each image). By
         default, images with a different (physical) aspect than specified card
         dimensions are rotated to the expected aspect (portrait or landscape).
         In 2-sided mode x and y offsets are applied to the back side pages,
-        which enables making adjustments for printer alignment issues.
+        which enables making adjustments for printer alignment issues. With
+        --jobs card images are loaded in parallel by multiple threads (or
+        processes if --processes is set); if the value 0 is given, one worker
+        per CPU is used. With --cache processed card images are stored in a
+        persistent cache, so that later jobs with the same card images and
+        settings can skip all image processing (see lcg_cache).
 
         """
         epilog = textwrap.dedent(epilog)
@@ -78,6 +93,20 @@ class Arguments(object):
         parser.add_argument('--bleed', metavar='MM', nargs=1, type=float,
                             default=[None], help='bleed in mm [a4/a3:3, '
                             'letter/tabloid:1.5]')
+        parser.add_argument('--bleed_method', nargs=1, type=str.lower,
+                            default=[None],
+                            choices=['simple', 'numpy', 'mirror', 'reflect'],
+                            help='method for adding bleed [simple]')
+        parser.add_argument('--resample', nargs=1, type=str.lower,
+                            default=[None],
+                            choices=['fast', 'balanced', 'best'],
+                            help='image scaling quality [fast]')
+        parser.add_argument('--native_resolution', action='store_true',
+                            help='do not upscale low resolution images')
+        parser.add_argument('--image_encoding', nargs=1, type=str.lower,
+                            default=[None],
+                            choices=['jpeg', 'lossless', 'auto'],
+                            help='compression of images in PDF [jpeg]')
         parser.add_argument('--width', metavar='MM', nargs=1, type=float,
                             default=[None], help='card width in mm [61.5]')
         parser.add_argument('--height', metavar='MM', nargs=1, type=float,
@@ -133,6 +162,16 @@ class Arguments(object):
         parser.add_argument('-p', '--profile', metavar='NAME', nargs=1,
                             type=str, default=[None, ],
                             help='profile in config file for listed cards')
+        parser.add_argument('-j', '--jobs', metavar='N', nargs=1, type=int,
+                            default=[1], help='number of workers for loading '
+                            'card images [1]')
+        parser.add_argument('--processes', action='store_true',
+                            help='use worker processes rather than threads')
+        parser.add_argument('--cache', action='store_true',
+                            help='use persistent cache of processed images')
+        parser.add_argument('--trace', metavar='FILE', nargs=1, type=str,
+                            default=[None], help='write processing stage '
+                            'timings to FILE (chrome trace format)')
         parser.add_argument('-v', '--verbose', action='store_true',
                             help='enable verbose output to stderr')
         parser.add_argument('--exc', action='store_true',
@@ -146,6 +185,10 @@ class Arguments(object):
         self.overwrite = args.overwrite
         self.pagesize, = args.pagesize
         self.bleed, = args.bleed
+        self.bleed_method, = args.bleed_method
+        self.resample, = args.resample
+        self.native_resolution = args.native_resolution
+        self.image_encoding, = args.image_encoding
         self.width, = args.width
         self.height, = args.height
         self.dpi, = args.dpi
@@ -170,8 +213,17 @@ class Arguments(object):
         self.conf = args.conf
         self.game, = args.game
         self.profile, = args.profile
+        self.jobs, = args.jobs
+        self.processes = args.processes
+        self.cache = args.cache
+        self.trace, = args.trace
         self.verbose = args.verbose
 
+        if self.jobs < 0:
+            raise LcgException('--jobs must be non-negative')
+        elif self.jobs == 0:
+            self.jobs = os.cpu_count() or 1
+
         # If --conf was specified, load config file
         if self.conf:
             self.conf = get_app_properties(game=self.game)
@@ -203,6 +255,25 @@ class Arguments(object):
             bleed_def = 3 if self.pagesize in ('a4', 'a3') else 1.5
             self.bleed = c_prop('card_bleed_mm', profile=profile,
                                 default=bleed_def)
+        if self.bleed_method is None:
+            self.bleed_method = c_prop('bleed_method', profile=profile,
+                                       default='simple').lower()
+            if self.bleed_method not in ('simple', 'numpy', 'mirror',
+                                         'reflect'):
+                raise LcgException('Config file option "bleed_method" must be '
+                                   'one of simple, numpy, mirror or reflect')
+        if self.resample is None:
+            self.resample = c_prop('resample', profile=profile,
+                                   default='fast').lower()
+            if self.resample not in ('fast', 'balanced', 'best'):
+                raise LcgException('Config file option "resample" must be '
+                                   'one of fast, balanced or best')
+        if self.image_encoding is None:
+            self.image_encoding = c_prop('image_encoding', profile=profile,
+                                         default='jpeg').lower()
+            if self.image_encoding not in ('jpeg', 'lossless', 'auto'):
+                raise LcgException('Config file option "image_encoding" must '
+                                   'be one of jpeg, lossless or auto')
         if self.spacing is None:
             alt = 1 if self.pagesize in ('a4', 'a3') else 0
             self.spacing = c_prop('card_min_spacing_mm', profile=profile,
@@ -232,6 +303,12 @@ class Arguments(object):
             self.verbose = get_str_bool_prop('verbose')
         if not self.overwrite:
             self.overwrite = get_str_bool_prop('overwrite')
+        if not self.native_resolution:
+            self.native_resolution = get_str_bool_prop('native_resolution')
+        if not self.cache:
+            self.cache = get_str_bool_prop('image_cache')
+        self.cache_size_mb = c_prop('image_cache_size_mb', profile=profile,
+                                    default=None)
 
         # Set profile specific defaults
         if self.back_file is None and profile is not None:
@@ -248,9 +325,17 @@ class Arguments(object):
 
 def main():
     generator = None
+    loader = None
+    tracer = None
     args = None
     try:
         args = Arguments()
+
+        # Qt is imported only after parsing arguments, for fast startup
+        from lcgtools.graphics import LcgCardPdfGenerator, LcgAspectRotation
+        from lcgtools.graphics import LcgCardLoader, LcgImageInfo, LcgTracer
+        from PySide6.QtGui import QGuiApplication
+
         verb = lambda msg: sys.stderr.write(msg+'\n') if args.verbose else None
         if args.conf:
             _conf_file = Utility.path_relative_to_home(args.conf.filename)
@@ -261,6 +346,10 @@ def main():
                 verb(f'\nLoaded default app properties file:\n'
                      f'{_conf_file}')
 
+        if args.trace:
+            tracer = LcgTracer()
+            tracer.activate()
+
         if args.only_front and args.only_back:
             raise LcgException('Cannot apply both of --only_front and '
                                '--only_back')
@@ -268,7 +357,7 @@ def main():
         even = False if args.only_front else True
 
         # Required to make Qt application run headless
-        app = QApplication([sys.argv[0], '-platform', 'offscreen'])
+        app = QGuiApplication([sys.argv[0], '-platform', 'offscreen'])
 
         # Set up a PDF file generator
         if args.overwrite and os.path.exists(args.output):
@@ -284,16 +373,37 @@ def main():
         generator.setTwosidedEvenPageOffset(args.back_offset_x,
                                             args.back_offset_y)
         generator.setFeedDir(args.feed_dir)
+        generator.setBleedMethod(args.bleed_method)
+        generator.setResampleQuality(args.resample)
+        generator.setNativeResolution(args.native_resolution)
+        generator.setImageEncoding(args.image_encoding)
+        if args.cache:
+            cache = get_image_cache(args.cache_size_mb)
+            generator.setImageCache(cache)
+        loader = LcgCardLoader(generator, jobs=args.jobs,
+                               processes=args.processes)
 
         verb(f'\nOpened {args.output} for PDF output:')
         verb(f'- page size          : {args.pagesize.capitalize()}')
         verb(f'- page margin        : {args.margin:.1f} mm')
         verb(f'- card size          : {args.width:.1f}x{args.height:.1f} mm')
         verb(f'- bleed              : {args.bleed:.1f} mm')
+        verb(f'- bleed method       : {args.bleed_method}')
+        verb(f'- resample quality   : {args.resample}')
+        if args.native_resolution:
+            verb('- image resolution   : native (up to page dpi)')
+        verb(f'- image encoding     : {args.image_encoding}')
         verb(f'- size with bleed    : {(args.width+2*args.bleed):.1f}x'
              f'{(args.height + 2*args.bleed):.1f} mm')
         verb(f'- card spacing (min) : {args.spacing:.1f} mm')
-        verb(f'- max cards per page : {generator._cards_per_page}')
+        verb(f'- max cards per page : {generator.layout.cards_per_page}')
+        if loader.processes:
+            verb(f'- loader processes   : {loader.jobs}')
+        else:
+            verb(f'- loader threads     : {loader.jobs}')
+        if args.cache:
+            _cache_dir = Utility.path_relative_to_home(cache.path)
+            verb(f'- image cache        : {_cache_dir}')
 
         verb('')
         if not args.twosided:
@@ -326,99 +436,126 @@ def main():
                 for f2 in os.listdir(f):
                     f2 = os.path.join(f, f2)
                     if os.path.isfile(f2):
-                        if not LcgImage(f2).isNull():
+                        if LcgImageInfo(f2).isValid():
                             front_files.append(f2)
             else:
                 # For files, validate that they are an image file
-                if LcgImage(f).isNull():
+                if not LcgImageInfo(f).isValid():
                     raise LcgException(f'Not a valid image: "{f}"')
                 front_files.append(f)
 
+        # Back side images loaded during this run, shared by all card lists.
+        # Backs are rotated when drawn, so one image serves all orientations
+        back_images = dict()
+        _trans_key = aspect_trans.key() if aspect_trans else None
+
+        def back_side(filename, bleed):
+            """Returns lazy reference to back side image, loaded once."""
+            key = (os.path.realpath(filename), bleed, _trans_key)
+
+            def _load():
+                if key not in back_images:
+                    back_images[key] = loader.load(filename,
+                                                   trans=aspect_trans,
+                                                   bleed=bleed,
+                                                   defer_rotation=True)
+                return back_images[key]
+            return _load
+
+        def draw_cards(records):
+            """Loads and draws cards from a stream of card list records."""
+            back_img = None
+            # Folded backs are printed upside down, rotated when drawn
+            back_rotation = 0 if args.twosided else 180
+            front_bleed = 0
+            for record in records:
+                if isinstance(record, LcgCardListBack):
+                    if record.filename is not None:
+                        back_img = back_side(record.filename, record.bleed)
+                        _b_name = Utility.path_relative_to_home(
+                            record.filename)
+                        verb(f'- using back side ({record.bleed:.1f} mm '
+                             f'bleed):\n  {_b_name}')
+                    else:
+                        back_img = None
+                        verb('- using blank back side')
+                elif isinstance(record, LcgCardListBleed):
+                    front_bleed = record.bleed
+                    verb(f'- set bleed on loaded front images to '
+                         f'{front_bleed:.1f} mm')
+                else:
+                    _card_file = Utility.path_relative_to_home(record.filename)
+                    verb(f'- adding card: {_card_file}')
+                    front_img = partial(loader.load, record.filename,
+                                        trans=aspect_trans,
+                                        bleed=front_bleed,
+                                        defer_rotation=True)
+                    loader.drawCard(front_img, back_img,
+                                    back_rotation=back_rotation)
+
+        # Validate provided card lists before generating any cards
+        for l in args.lists:
+            with open(l, 'r') as f:
+                for _ in parse_card_list(f, name=f'"{l}"', check_files=True):
+                    pass
+
         # Add any cards passed on the command line
         if front_files:
             verb('\nProcessing image files passed on command line:')
-            if args.back_file is not None:
-                back_img = generator.loadCard(args.back_file,
-                                              trans=aspect_trans,
-                                              bleed=args.back_bleed)
-                _back_file = Utility.path_relative_to_home(args.back_file)
-                verb(f'- loaded back side ({args.back_bleed:.1f} mm bleed): '
-                     f'\n  {_back_file}')
-                if not args.twosided:
-                    back_img = back_img.rotateHalfCircle()
-            else:
-                back_img = None
-                verb('- using blank back side')
-            verb(f'- set bleed on loaded front images to '
-                 f'{args.front_bleed:.1f} mm')
-            for f in front_files:
-                front_img = generator.loadCard(f, trans=aspect_trans,
-                                               bleed=args.front_bleed)
-                verb(f'- adding card: "{f}"')
-                generator.drawCard(front_img, back_img)
+            records = [LcgCardListBack(args.back_file, args.back_bleed, None),
+                       LcgCardListBleed(args.front_bleed, None)]
+            records.extend(LcgCardListFront(f, None) for f in front_files)
+            draw_cards(records)
 
         # Parse any list of cards provided on stdin or in provided lists
-        lists = args.lists
         if args.parse_stdin:
-            lists = [None] + lists
-        for l in lists:
-            if l is None:
-                verb('\nParsing file list from stdin:')
-                l = sys.stdin
-            else:
-                verb(f'\nParsing file list from file "{l}"')
-                l = open(l, 'r')
-            back_name = None
-            back_img = None
-            front_bleed = None
-            l_num = 0
-            for line in l:
-                l_num += 1
-                line = line.rstrip('\r\n')
-                if not line:
-                    back_name = None
-                    back_img = None
-                    front_bleed = None
-                else:
-                    if back_name is None:
-                        # Next line is file name for a card back side
-                        back_name = line
-                    elif back_img is None:
-                        # Next line is bleed mm for provided back side
-                        back_bleed = float(line)
-                        back_img = generator.loadCard(back_name,
-                                                      trans=aspect_trans,
-                                                      bleed=back_bleed)
-                        _b_name = Utility.path_relative_to_home(back_name)
-                        verb(f'- loaded back side ({back_bleed:.1f} mm bleed):'
-                             f'\n  {_b_name}')
-                        if not args.twosided:
-                            back_img = back_img.rotateHalfCircle()
-                    elif front_bleed is None:
-                        # Next line is the bleed on front images
-                        front_bleed = float(line)
-                        verb(f'- set bleed on loaded front images to '
-                             f'{front_bleed:.1f} mm')
-                    else:
-                        # Next line is a file name for a card front image
-                        _card_file = Utility.path_relative_to_home(line)
-                        verb(f'- adding card: {_card_file}')
-                        front_img = generator.loadCard(line,
-                                                       trans=aspect_trans,
-                                                       bleed=front_bleed)
-                        generator.drawCard(front_img, back_img)
-
-        # Write PDF file and close
+            verb('\nParsing file list from stdin:')
+            draw_cards(parse_card_list(sys.stdin, name='stdin',
+                                       check_files=True))
+        for l in args.lists:
+            verb(f'\nParsing file list from file "{l}"')
+            with open(l, 'r') as f:
+                draw_cards(parse_card_list(f, name=f'"{l}"'))
+
+        # Draw any remaining queued cards, then write PDF file and close
+        loader.finish()
         _out_file = Utility.path_relative_to_home(args.output)
-        verb(f'\nCard generation done, saving pdf as {_out_file}\n')
+        verb(f'\nCard generation done, saving pdf as {_out_file}')
         generator.finish()
+        if generator.dedup_count:
+            _saved_mb = generator.dedup_bytes_saved/1024**2
+            verb(f'- reused embedded images for {generator.dedup_count} '
+                 f'identical images ({_saved_mb:.1f} MB uncompressed pixels)')
+        if generator.card_count:
+            _size = os.path.getsize(args.output)
+            _n_enc = generator.encoding_count
+            verb(f'- wrote {_size/1024**2:.1f} MB for {generator.card_count} '
+                 f'cards, {_size/1024/generator.card_count:.0f} KB per card '
+                 f'({_n_enc["jpeg"]} jpeg and {_n_enc["lossless"]} lossless '
+                 f'images)')
+        if generator.native_count:
+            _saved_mpx = generator.native_pixels_saved/1e6
+            verb(f'- embedded {generator.native_count} images at native '
+                 f'resolution, saving {_saved_mpx:.1f} megapixels')
+        verb('')
+
+        if args.trace:
+            tracer.writeChromeTrace(args.trace)
+            _trace_file = Utility.path_relative_to_home(args.trace)
+            sys.stderr.write(f'Processing stage timings (trace written to '
+                             f'{_trace_file}):\n{tracer.summaryTable()}\n\n')
     except Exception as e:
         # PDF did not generate successfully, remove PDF file and re-raise
         sys.stderr.write(f'\nError: {e}\n\n')
+        if loader:
+            loader.abort()
         if generator:
             generator.abort(remove=True)
         if args and args.exc:
             raise e
+    finally:
+        if tracer:
+            tracer.deactivate()
 
 if __name__ == '__main__':
     main()
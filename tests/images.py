@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Test images for the lcgtools tests.
+
+Tests are run from the repository root with ``python -m pytest``.
+
+"""
+
+import random
+
+from PySide6 import QtGui
+
+from lcgtools.graphics import LcgImage
+
+
+def noise_image(width, height, dpi=300, seed=0):
+    """Returns an image of random pixels.
+
+    :param  width: image width (pixels)
+    :param height: image height (pixels)
+    :param    dpi: image resolution
+    :param   seed: seed for random pixel values
+    :return:       opaque image in format Format_RGB32
+    :rtype:        :class:`lcgtools.graphics.LcgImage`
+
+    Random pixels make any difference in which source pixels are sampled
+    visible in the result.
+
+    """
+    n_bytes = 3*width*height
+    data = random.Random(seed).getrandbits(8*n_bytes)
+    data = data.to_bytes(n_bytes, 'little')
+    img = QtGui.QImage(data, width, height, 3*width,
+                       QtGui.QImage.Format_RGB888)
+    img = img.convertToFormat(QtGui.QImage.Format_RGB32)
+    img.setDotsPerMeterX(round(dpi*1000/25.4))
+    img.setDotsPerMeterY(round(dpi*1000/25.4))
+    return LcgImage(img)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Tests of :class:`lcgtools.graphics.LcgImage` bleed operations."""
+
+import pytest
+from PySide6 import QtGui
+
+from images import noise_image
+
+# Largest allowed difference (per color channel) between scaledWithBleed()
+# and adding or cropping bleed before resampling
+MAX_DIFF = 0
+
+
+def _max_diff(img1, img2):
+    """Returns largest difference of a color channel of two images."""
+    assert (img1.width(), img1.height()) == (img2.width(), img2.height())
+    fmt = QtGui.QImage.Format_RGB32
+    img1, img2 = img1.convertToFormat(fmt), img2.convertToFormat(fmt)
+    diff = 0
+    for y in range(img1.height()):
+        line1 = bytes(img1.constScanLine(y))[:4*img1.width()]
+        line2 = bytes(img2.constScanLine(y))[:4*img2.width()]
+        if line1 != line2:
+            diff = max(diff, max(abs(a - b) for a, b in zip(line1, line2)))
+    return diff
+
+
+@pytest.mark.parametrize('method', ['simple', 'mirror', 'reflect'])
+@pytest.mark.parametrize('resample', ['fast', 'balanced'])
+@pytest.mark.parametrize('size', [(173, 239), (451, 617)])
+def test_added_bleed(method, resample, size):
+    img = noise_image(300, 416)
+    width, height = size
+    expected = img.addBleed(3, method=method).resampled(width, height,
+                                                        resample)
+    result = img.scaledWithBleed(width, height, 3, method=method,
+                                 resample=resample)
+    assert _max_diff(result, expected) <= MAX_DIFF
+    assert result.widthMm() == pytest.approx(img.widthMm() + 6, rel=1e-2)
+
+
+@pytest.mark.parametrize('size', [(173, 239), (451, 617)])
+def test_cropped_bleed(size):
+    img = noise_image(300, 416)
+    width, height = size
+    expected = img.cropBleed(2).resampled(width, height)
+    result = img.scaledWithBleed(width, height, -2)
+    assert _max_diff(result, expected) <= MAX_DIFF
+
+
+@pytest.mark.parametrize('size, bleed', [((300, 416), 2), ((300, 3), 0.1)])
+def test_cropped_view(size, bleed):
+    # With 3 pixel rows no rows are cropped, so a view from the first row
+    # with the image's bytes per line would run past the end of the image
+    img = noise_image(*size)
+    view = img._cropped(bleed, view=True)
+    expected = img.cropBleed(bleed)
+    assert view.size() == expected.size() != img.size()
+    assert _max_diff(view, expected) == 0
+
+
+@pytest.mark.parametrize('resample', ['fast', 'balanced', 'best'])
+def test_pending_rotation(resample):
+    img = noise_image(300, 416)
+    img.setRotation(90)
+    derived = [img.addBleed(1), img.cropBleed(1),
+               img._cropped(1, view=True),
+               img.scaledWithBleed(173, 239, 1, resample=resample),
+               img.scaledWithBleed(173, 239, -1, resample=resample),
+               img.resampled(173, 239, resample)]
+    assert [d.rotation() for d in derived] == [90]*len(derived)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Tests of :class:`lcgtools.graphics.LcgImageCache`."""
+
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import pickle
+
+from images import noise_image
+from lcgtools.graphics import LcgImage, LcgImageCache
+
+
+def test_put_and_get(tmp_path):
+    cache = LcgImageCache(str(tmp_path))
+    img = noise_image(30, 40)
+    img.setRotation(90)
+    cache.put('a', img)
+    result = cache.get('a')
+    assert result == img
+    assert result.rotation() == 90
+    assert cache.get('b') is None
+
+
+def test_threads_keep_size_limit(tmp_path):
+    images = [noise_image(30, 40, seed=i) for i in range(40)]
+    entry_size = LcgImageCache._HEADER.size + images[0].sizeInBytes()
+    max_size = 10*entry_size
+    cache = LcgImageCache(str(tmp_path), max_size=max_size)
+    cache.put('first', images[0])
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: cache.put(f'key{i}', images[i]),
+                          range(len(images))))
+    n_entries, size = cache.stats()
+    assert size <= max_size
+    assert n_entries == 10
+    # Concurrent updates of the tracked size must not be lost (it may
+    # exceed the size of cache files, if a file was written by one thread
+    # while another pruned the cache)
+    assert cache._size >= size
+
+
+def test_pickle(tmp_path):
+    cache = LcgImageCache(str(tmp_path), max_size=1000000)
+    cache.put('a', noise_image(30, 40))
+    copy = pickle.loads(pickle.dumps(cache))
+    assert copy.path == cache.path and copy.max_size == cache.max_size
+    assert copy._lock is not cache._lock
+    assert copy.get('a') == cache.get('a')
+
+
+def test_copy_keeps_buffer(tmp_path):
+    cache = LcgImageCache(str(tmp_path))
+    img = noise_image(30, 40)
+    cache.put('a', img)
+    result = cache.get('a')
+    copy = LcgImage(result)
+    del result
+    gc.collect()
+    assert copy._buffer is not None
+    assert copy == img
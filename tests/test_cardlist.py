@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Tests of the lcg_cardlist script."""
+
+import io
+import sys
+
+from images import noise_image
+from lcgtools.scripts import cardlist
+
+
+def _run(monkeypatch, capsys, args, stdin):
+    """Runs lcg_cardlist, returns tuple (stdout, stderr)."""
+    monkeypatch.setattr(sys, 'argv', ['lcg_cardlist', *args])
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(stdin))
+    cardlist.main()
+    captured = capsys.readouterr()
+    return captured.out, captured.err
+
+
+def test_stdin_passed_on_unchanged(tmp_path, monkeypatch, capsys):
+    back, front = str(tmp_path/'back.png'), str(tmp_path/'front.png')
+    noise_image(20, 28).save(back)
+    noise_image(20, 28, seed=1).save(front)
+    stdin = f'{back}\n0.50\n1\n{front}\n\n{back}\n2\n0\n{front}\n{front}\n'
+    generated = f'{back}\n0\n0\n{front}\n\n'
+
+    out, err = _run(monkeypatch, capsys, ['--stdin', '-b', back, front],
+                    stdin)
+    assert err == ''
+    assert out == stdin + generated
+    out, err = _run(monkeypatch, capsys,
+                    ['--stdin', '--first', '-b', back, front], stdin)
+    assert out == generated + stdin
+
+
+def test_invalid_stdin(tmp_path, monkeypatch, capsys):
+    back, front = str(tmp_path/'back.png'), str(tmp_path/'front.png')
+    noise_image(20, 28).save(back)
+    noise_image(20, 28, seed=1).save(front)
+    out_file = tmp_path/'list.txt'
+
+    out, err = _run(monkeypatch, capsys,
+                    ['--stdin', '-o', str(out_file), '-b', back, front],
+                    f'{back}\nx\n0\n{front}\n')
+    assert 'Card list stdin, line 2: invalid bleed value "x"' in err
+    assert not out_file.exists()
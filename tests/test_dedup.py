@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Tests of image deduplication in generated PDFs."""
+
+import pytest
+from PySide6 import QtGui
+
+from images import noise_image
+from lcgtools.graphics import LcgCardPdfGenerator
+
+
+@pytest.fixture
+def generator(tmp_path):
+    """Returns a folded mode PDF generator (with a Qt application)."""
+    if QtGui.QGuiApplication.instance() is None:
+        QtGui.QGuiApplication(['lcg_test', '-platform', 'offscreen'])
+    gen = LcgCardPdfGenerator(outfile=str(tmp_path/'out.pdf'),
+                              pagesize='a4', dpi=60, c_width=63.5,
+                              c_height=88, bleed=3)
+    yield gen
+    gen.abort()
+
+
+def test_identical_images_are_reused(generator):
+    w_px = generator.mm_to_px(63.5 + 6)
+    h_px = generator.mm_to_px(88 + 6)
+    first = noise_image(w_px, h_px, seed=1)
+    same = noise_image(w_px, h_px, seed=1)
+    other = noise_image(w_px, h_px, seed=2)
+    back = QtGui.QColor('white')
+
+    generator.drawCard(first, back)
+    assert generator.dedup_count == 0
+    generator.drawCard(same, back)
+    assert generator.dedup_count == 1
+    assert generator.dedup_bytes_saved == first.sizeInBytes()
+    # Redrawing known image objects is not a saving, as the PDF writer
+    # embeds an image object once anyway, and a different image with the
+    # same geometry is not mistaken for a drawn image
+    generator.drawCard(same, back)
+    generator.drawCard(first, back)
+    generator.drawCard(other, back)
+    assert generator.dedup_count == 1
+    # Only another distinct image object with identical content counts
+    generator.drawCard(noise_image(w_px, h_px, seed=1), back)
+    assert generator.dedup_count == 2
+
+    # Image differing only in rows not sampled for the signature
+    changed = QtGui.QImage(first)
+    changed.setPixel(0, 1, changed.pixel(0, 1) ^ 0xffffff)
+    assert changed.cacheKey() != first.cacheKey()
+    generator.drawCard(changed, back)
+    assert generator.dedup_count == 2
+
+
+def test_stamped_pages_are_not_counted(tmp_path):
+    if QtGui.QGuiApplication.instance() is None:
+        QtGui.QGuiApplication(['lcg_test', '-platform', 'offscreen'])
+    gen = LcgCardPdfGenerator(outfile=str(tmp_path/'out.pdf'),
+                              pagesize='a4', dpi=60, c_width=63.5,
+                              c_height=88, bleed=3, folded=False)
+    try:
+        w_px, h_px = gen.mm_to_px(63.5 + 6), gen.mm_to_px(88 + 6)
+        back = noise_image(w_px, h_px, seed=1)
+        # Three full pages with the same back image object, so back pages
+        # after the first are replayed
+        for i in range(3*gen.layout.cards_per_page):
+            gen.drawCard(QtGui.QColor('white'), back)
+        gen.finish()
+        assert gen.dedup_count == 0
+    finally:
+        if not gen._done:
+            gen.abort()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Tests of :class:`lcgtools.graphics.LcgImage` in shared memory.
+
+Checks are run in a new process, as reading pixels of a closed shared
+memory block crashes the process.
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import gc
+import multiprocessing
+from multiprocessing import shared_memory
+
+from images import noise_image
+from lcgtools.graphics import LcgImage
+
+
+def _copy_outlives_image():
+    """Returns True if a copy of a shared memory image keeps its pixels."""
+    src = noise_image(30, 40)
+    src.setRotation(90)
+    shm = shared_memory.SharedMemory(create=True, size=src.sizeInBytes())
+    shm.unlink()
+    img = LcgImage._fromSharedMemory(shm, *src._toSharedMemory(shm))
+    copy = LcgImage(img)
+    del img, shm
+    gc.collect()
+    return copy == src and copy.rotation() == 90
+
+
+def test_shared_memory_copy():
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+        assert executor.submit(_copy_outlives_image).result()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Tests that command line scripts start without importing PySide6.
+
+Each console script entry point listed in ``setup.cfg`` is called with
+``--version`` in a new interpreter, which must not have imported PySide6
+when the script exits.
+
+"""
+
+import configparser
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Runs an entry point, then reports whether PySide6 was imported
+CODE = '''
+import sys
+from {module} import {func}
+sys.argv = [{name!r}, '--version']
+try:
+    {func}()
+except SystemExit as e:
+    if e.code:
+        raise
+sys.exit(3 if 'PySide6' in sys.modules else 0)
+'''
+
+
+def _entry_points():
+    """Returns list of (name, module, func) console script entry points."""
+    conf = configparser.ConfigParser()
+    conf.read(ROOT / 'setup.cfg')
+    scripts = conf['options.entry_points']['console_scripts']
+    result = []
+    for line in scripts.strip().splitlines():
+        name, target = (s.strip() for s in line.split('='))
+        module, func = target.split(':')
+        result.append((name, module, func))
+    return result
+
+
+@pytest.mark.parametrize('name, module, func', _entry_points())
+def test_version_does_not_import_qt(name, module, func):
+    env = dict(os.environ)
+    path = [str(ROOT / 'src'), env.get('PYTHONPATH', '')]
+    env['PYTHONPATH'] = os.pathsep.join(p for p in path if p)
+    code = CODE.format(name=name, module=module, func=func)
+    proc = subprocess.run([sys.executable, '-c', code], env=env,
+                          capture_output=True, text=True)
+    assert proc.returncode != 3, f'{name} --version imported PySide6'
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip().startswith(name)
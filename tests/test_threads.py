@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 Cloudberries
+#
+# This file is part of lcgtools
+#
+# lcgtools is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# lcgtools is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with lcgtools.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Tests of :class:`lcgtools.graphics.LcgImage` operations in threads.
+
+Bleed, crop, scaling and rotation operations are run concurrently from a
+thread pool, without a Qt application object, on source images shared by
+all threads. Each result must equal the result of the same operation run
+serially.
+
+Operations are run in batches, each in a new process. Some PySide6 releases
+leak a reference to None for each call of a Qt method without a return
+value, which crashes a process after some thousands of Qt calls.
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
+import multiprocessing
+import random
+
+import pytest
+
+from images import noise_image
+
+THREADS = 8
+BATCHES = 4
+BATCH_OPERATIONS = 500
+
+
+def _operations():
+    """Returns list of (name, func) operations to test."""
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    bleed_methods = ['simple', 'mirror', 'reflect']
+    if numpy:
+        bleed_methods.append('numpy')
+    ops = []
+    for method in bleed_methods:
+        for bleed in (0.5, 3):
+            ops.append((f'addBleed({bleed}, {method})',
+                        lambda i, b=bleed, m=method: i.addBleed(b, method=m)))
+        ops.append((f'scaledWithBleed(3, {method})',
+                    lambda i, m=method: i.scaledWithBleed(
+                        i.width()//2, i.height()//2, 3, method=m)))
+    ops.append(('cropBleed(2)', lambda i: i.cropBleed(2)))
+    ops.append(('_cropped(2, view)', lambda i: i._cropped(2, view=True)))
+    ops.append(('scaledWithBleed(-2)',
+                lambda i: i.scaledWithBleed(i.width()//2, i.height()//2, -2)))
+    for quality in ('fast', 'balanced', 'best'):
+        ops.append((f'resampled({quality})',
+                    lambda i, q=quality: i.resampled(i.width()*2//3,
+                                                     i.height()*2//3, q)))
+    for rotation in (90, 180, 270):
+        ops.append((f'rotateRightAngle({rotation})',
+                    lambda i, r=rotation: i.rotateRightAngle(r)))
+    return ops
+
+
+def _digest(img):
+    """Returns a digest of image pixels and physical size."""
+    h = hashlib.blake2b(digest_size=16)
+    for y in range(img.height()):
+        h.update(bytes(img.constScanLine(y))[:img.width()*img.depth()//8])
+    h.update(repr((img.width(), img.height(), img.format().value,
+                   img.dotsPerMeterX(), img.dotsPerMeterY())).encode())
+    return h.hexdigest()
+
+
+def _run_batch(n_ops, seed):
+    """Runs operations in a thread pool and compares with serial results.
+
+    :return: list of error messages (empty if all results are equal)
+
+    """
+    sources = [noise_image(150, 208, dpi=60, seed=seed + s) for s in range(2)]
+    ops = _operations()
+    references = {(s, o): _digest(func(src))
+                  for s, src in enumerate(sources)
+                  for o, (name, func) in enumerate(ops)}
+    rand = random.Random(seed)
+    tasks = [(rand.randrange(len(sources)), rand.randrange(len(ops)))
+             for i in range(n_ops)]
+
+    def run(task):
+        s, o = task
+        name, func = ops[o]
+        try:
+            result = _digest(func(sources[s]))
+        except Exception as e:
+            return f'{name}: {e!r}'
+        if result != references[task]:
+            return f'{name}: result differs from serial result'
+        return None
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        return [e for e in executor.map(run, tasks) if e]
+
+
+@pytest.mark.parametrize('batch', range(BATCHES))
+def test_threads_match_serial(batch):
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+        errors = executor.submit(_run_batch, BATCH_OPERATIONS, batch).result()
+    assert errors == []